@@ -2,9 +2,28 @@ import os
 import sys
 import re
 import time
+import codecs
+import gzip
+import bz2
+import lzma
+import json
+import uuid
+import queue
+import pickle
+import tempfile
+import threading
+import bisect
+import collections
+import multiprocessing
+from array import array
 from datetime import datetime
+if sys.platform.startswith("win"):
+    import msvcrt
+else:
+    import fcntl
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
+from tkinter import ttk, filedialog, messagebox, simpledialog
+from tkinter import font as tkfont
 
 APP_NAME = "Advanced Notepad"
 MAX_RECENTS = 10
@@ -15,12 +34,1809 @@ PY_KEYWORDS = {
     "in","is","lambda","nonlocal","not","or","pass","raise","return","try","while","with","yield"
 }
 
+# File decoding: only the first SNIFF_BYTES are inspected, the rest is streamed
+SNIFF_BYTES = 64 * 1024
+READ_CHUNK = 256 * 1024
+WRITE_CHUNK = 256 * 1024
+
+# Longest BOMs first so UTF-32-LE is not mistaken for UTF-16-LE
+BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+NEWLINE_NAMES = {"\n": "LF", "\r\n": "CRLF", "\r": "CR"}
+
+# Compressed files are recognised by magic bytes, not by extension
+COMPRESSION_MAGIC = [
+    (b"\x1f\x8b", "gzip"),
+    (b"BZh", "bz2"),
+    (b"\xfd7zXZ\x00", "xz"),
+]
+COMPRESSION_EXTENSIONS = {".gz": "gzip", ".bz2": "bz2", ".xz": "xz"}
+DEFAULT_COMPRESSION_LEVEL = {"gzip": 6, "bz2": 9, "xz": 6}
+LOAD_QUEUE_CHUNKS = 8   # decoded chunks waiting for the UI; bounds loader memory
+LOAD_POLL_MS = 20
+LOAD_SLICE_SECONDS = 0.05
+
+# Undo history: characters kept in RAM per tab before the oldest groups are spilled to disk
+UNDO_MEMORY_LIMIT = 16 * 1024 * 1024
+UNDO_SPILL = True
+DELTA_OVERHEAD = 64
+
+# Crash recovery: every tab's edits are appended to a write-ahead log in RECOVERY_DIR
+RECOVERY_DIR = os.path.join(os.path.expanduser("~"), ".advanced_notepad", "recovery")
+RECOVERY_FLUSH_MS = 1000
+RECOVERY_COMPACT_BYTES = 1024 * 1024
+
+# Buffer-vs-disk diff
+DIFF_DEBOUNCE_MS = 400
+DIFF_POLL_MS = 50
+DIFF_MAX_COST = 1000    # edit distance explored per region before treating it as one replace
+DIFF_CONTEXT = 3
+
+# Regex search runs in a child process with a time budget (seconds)
+SEARCH_TIME_BUDGET = 5.0
+SEARCH_BATCH = 1000
+SEARCH_POLL_MS = 30
+
+# Filtered line views scan the buffer this many lines per Tk tick
+FILTER_CHUNK_LINES = 20000
+FILTER_TICK_MS = 1
+
+# Symbol outline (classes and functions, nested by indentation)
+SYMBOL_RE = re.compile(r"([ \t]*)(?:async[ \t]+)?(def|class)[ \t]+([A-Za-z_]\w*)")
+SYMBOL_PROMPT_ROWS = 200
+OUTLINE_REFRESH_MS = 300
+
+def default_file_format():
+    return {"encoding": "utf-8", "bom": b"", "newline": os.linesep, "mixed": [], "compression": None, "level": None}
+
+def detect_compression(path):
+    with open(path, "rb") as f:
+        magic = f.read(10)
+    for signature, kind in COMPRESSION_MAGIC:
+        if magic.startswith(signature):
+            return kind, compression_level(kind, magic)
+    return None, None
+
+def compression_level(kind, magic):
+    if kind == "gzip":
+        # XFL header byte: 2 = slowest/best, 4 = fastest
+        xfl = magic[8] if len(magic) > 8 else 0
+        return 9 if xfl == 2 else 1 if xfl == 4 else DEFAULT_COMPRESSION_LEVEL[kind]
+    if kind == "bz2" and magic[3:4].isdigit():
+        # "BZh1".."BZh9" records the block size, which is the compression level
+        return int(magic[3:4])
+    # xz does not record its preset
+    return DEFAULT_COMPRESSION_LEVEL[kind]
+
+def open_binary(path, mode, compression=None, level=None):
+    if compression == "gzip":
+        return gzip.open(path, mode, compresslevel=level or DEFAULT_COMPRESSION_LEVEL["gzip"])
+    if compression == "bz2":
+        return bz2.open(path, mode, compresslevel=level or DEFAULT_COMPRESSION_LEVEL["bz2"])
+    if compression == "xz":
+        return lzma.open(path, mode, preset=level if "w" in mode else None)
+    return open(path, mode)
+
+def codec_errors(encoding):
+    # Stray bytes survive a round-trip as escapes Tk can display
+    return "notepad-escape" if encoding.startswith("utf-16") or encoding.startswith("utf-32") else "surrogateescape"
+
+def _escape_bytes(error):
+    """Decode error handler: undecodable bytes become escapes Tk can display.
+
+    Tk only accepts the \\udc80-\\udcff escapes surrogateescape uses, so a byte
+    below 0x80 (possible in broken UTF-16/32) becomes a pair of Unicode
+    noncharacters instead. _write_encoded writes both back verbatim.
+    """
+    if not isinstance(error, UnicodeDecodeError):
+        raise error
+    escaped = "".join(chr(0xDC00 + b) if b >= 0x80 else chr(0xFDD0 + (b >> 4)) + chr(0xFDE0 + (b & 0xF))
+                      for b in error.object[error.start:error.end])
+    return escaped, error.end
+
+codecs.register_error("notepad-escape", _escape_bytes)
+LOW_BYTE_ESCAPE = re.compile("([\ufdd0-\ufdd7])([\ufde0-\ufdef])")
+ESCAPED_BYTES = re.compile("([\udc00-\udcff]+)")
+
+def _unescape_low_bytes(text):
+    return LOW_BYTE_ESCAPE.sub(lambda m: chr(0xDC00 + ((ord(m[1]) - 0xFDD0) << 4 | (ord(m[2]) - 0xFDE0))), text)
+
+def guess_encoding(head):
+    if not head:
+        return "utf-8"
+    # Mostly-ASCII UTF-16 without a BOM has every other byte zero
+    half = max(1, len(head) // 2)
+    if head[1::2].count(0) > half * 0.3 and head[0::2].count(0) < half * 0.05:
+        return "utf-16-le"
+    if head[0::2].count(0) > half * 0.3 and head[1::2].count(0) < half * 0.05:
+        return "utf-16-be"
+    try:
+        # final=False tolerates a multibyte sequence cut off at the end of the head
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        # Not UTF-8, so a legacy codepage; Latin-1 text decodes the same under cp1252
+        return "cp1252"
+
+def dominant_newline(sample):
+    crlf = sample.count("\r\n")
+    counts = [(sample.count("\n") - crlf, "\n"), (crlf, "\r\n"), (sample.count("\r") - crlf, "\r")]
+    count, newline = max(counts, key=lambda c: c[0])
+    return newline if count else None
+
+# A CR that is not part of a CRLF, and an LF that is not preceded by a CR
+LONE_CR = re.compile("\r(?!\n)")
+LONE_LF = re.compile("(?<!\r)\n")
+
+def line_endings(text):
+    """Return the set of line break sequences present in text."""
+    crlf = text.count("\r\n")
+    counts = {"\n": text.count("\n") - crlf, "\r\n": crlf, "\r": text.count("\r") - crlf}
+    return {newline for newline, count in counts.items() if count}
+
+def decode_newlines(text, newline):
+    """Translate the file's own line break to '\\n', leaving other breaks verbatim."""
+    if newline == "\r\n":
+        return text.replace("\r\n", "\n")
+    if newline == "\r":
+        return LONE_CR.sub("\n", text)
+    return text
+
+def encode_newlines(text, newline, first=1, keep=()):
+    """Inverse of decode_newlines for text starting on line first.
+
+    The lines listed in the sorted keep end in a bare LF, as does a verbatim
+    CRLF in a CR file.
+    """
+    if newline == "\n":
+        return text
+    lo = bisect.bisect_left(keep, first)
+    hi = bisect.bisect_left(keep, first + text.count("\n"))
+    if lo == hi:
+        return text.replace("\n", "\r\n") if newline == "\r\n" else LONE_LF.sub("\r", text)
+    lines = text.split("\n")
+    breaks = ["\n" if newline == "\r" and line.endswith("\r") else newline for line in lines[:-1]]
+    for n in keep[lo:hi]:
+        breaks[n - first] = "\n"
+    return "".join(line + br for line, br in zip(lines, breaks)) + lines[-1]
+
+def lone_lf_lines(text, newline, first):
+    """Line numbers, counting text from line first once decoded, that end in a lone LF."""
+    found, pos = [], 0
+    for m in LONE_LF.finditer(text):
+        first += text.count("\n", pos, m.start())
+        if newline == "\r":
+            first += len(LONE_CR.findall(text, pos, m.start()))
+        found.append(first)
+        first += 1
+        pos = m.end()
+    return found
+
+def mixed_newline_warning(fmt):
+    """Describe what saving does to a file's minority line breaks, or None."""
+    if not fmt["mixed"]:
+        return None
+    newline = NEWLINE_NAMES[fmt["newline"]]
+    names = ", ".join(NEWLINE_NAMES[nl] for nl in fmt["mixed"])
+    if fmt["newline"] != "\n" and "\n" in fmt["mixed"]:
+        return (f"This file mixes {newline} with {names} line endings.\n"
+                f"They were kept as they were, except that lines you edited now end in {newline}.")
+    return f"This file mixes {newline} with {names} line endings.\nThey were all kept as they were."
+
+def sniff_text_format(head):
+    """Guess encoding, BOM and newline style from the first bytes of a file."""
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            break
+    else:
+        bom, encoding = b"", guess_encoding(head)
+    sample = head[len(bom):].decode(encoding, errors="replace")
+    return {"encoding": encoding, "bom": bom, "newline": dominant_newline(sample)}
+
+def iter_text_chunks(stream, fmt, head=b"", lone_lf=None):
+    """Decode a binary stream incrementally, translating its newlines to '\\n'.
+
+    If the sniffed head held no line break, the newline style is taken from
+    the first one seen while streaming. Line breaks of any other style are
+    listed in fmt["mixed"] and kept verbatim, except a lone LF in a CRLF or CR
+    file, which can't be told apart in the text: its line number is appended
+    to lone_lf instead.
+    """
+    decoder = codecs.getincrementaldecoder(fmt["encoding"])(errors=codec_errors(fmt["encoding"]))
+    carry = ""
+    seen = set()
+    line = 1
+    data = head or stream.read(READ_CHUNK)
+    while True:
+        text = carry + decoder.decode(data, final=not data)
+        carry = ""
+        # A CR at the end of a chunk may be the first half of a CRLF
+        if data and text.endswith("\r"):
+            text, carry = text[:-1], "\r"
+        if fmt["newline"] is None:
+            fmt["newline"] = dominant_newline(text)
+        seen |= line_endings(text)
+        if lone_lf is not None and fmt["newline"] not in (None, "\n"):
+            lone_lf.extend(lone_lf_lines(text, fmt["newline"], line))
+        if text:
+            text = decode_newlines(text, fmt["newline"])
+            line += text.count("\n")
+            yield text
+        if not data:
+            break
+        data = stream.read(READ_CHUNK)
+    if fmt["newline"] is None:
+        fmt["newline"] = os.linesep
+    fmt["mixed"] = sorted(seen - {fmt["newline"]})
+
+def iter_text_file(path, fmt, lone_lf=None):
+    """Yield the decoded text of a (possibly compressed) file chunk by chunk.
+
+    fmt is filled in with the detected compression, encoding and newline style.
+    """
+    compression, level = detect_compression(path)
+    fmt.update(compression=compression, level=level)
+    with open_binary(path, "rb", compression) as f:
+        head = f.read(SNIFF_BYTES)
+        fmt.update(sniff_text_format(head))
+        yield from iter_text_chunks(f, fmt, head[len(fmt["bom"]):], lone_lf)
+
+def read_text_file(path):
+    fmt = default_file_format()
+    content = "".join(iter_text_file(path, fmt))
+    return content, fmt
+
+def write_text_file(path, content, fmt, lone_lf=()):
+    """Write content back in its original encoding, BOM and newline style.
+
+    The lines in the sorted lone_lf end in a bare LF whatever the style.
+    Falls back to UTF-8 if the buffer holds characters the original encoding
+    can't represent; returns the format actually written.
+    """
+    try:
+        with open_binary(path, "wb", fmt["compression"], fmt["level"]) as f:
+            _write_encoded(f, content, fmt, lone_lf)
+    except UnicodeEncodeError:
+        fmt = dict(fmt, encoding="utf-8", bom=b"")
+        with open_binary(path, "wb", fmt["compression"], fmt["level"]) as f:
+            _write_encoded(f, content, fmt, lone_lf)
+    return fmt
+
+def _write_encoded(f, content, fmt, lone_lf):
+    encoder = codecs.getincrementalencoder(fmt["encoding"])(errors=codec_errors(fmt["encoding"]))
+    newline = fmt["newline"]
+    escaped = codec_errors(fmt["encoding"]) == "notepad-escape"
+    f.write(fmt["bom"])
+    carry = ""
+    line = 1
+    for i in range(0, len(content), WRITE_CHUNK):
+        chunk = carry + content[i:i + WRITE_CHUNK]
+        carry = ""
+        # Keep an escape pair, or a CR that may start a CRLF, together with what follows
+        if escaped and "\ufdd0" <= chunk[-1] <= "\ufdd7" or newline == "\r" and chunk[-1] == "\r":
+            chunk, carry = chunk[:-1], chunk[-1]
+        breaks = chunk.count("\n")
+        chunk = encode_newlines(chunk, newline, line, lone_lf)
+        line += breaks
+        if not escaped:
+            f.write(encoder.encode(chunk))
+            continue
+        # Escaped bytes go out verbatim, around the (stateless) encoder
+        for n, piece in enumerate(ESCAPED_BYTES.split(_unescape_low_bytes(chunk))):
+            f.write(bytes(ord(ch) - 0xDC00 for ch in piece) if n % 2 else encoder.encode(piece))
+    f.write(encoder.encode(carry, final=True))
+
+class FileLoader(threading.Thread):
+    """Decodes a file in the background and hands text chunks to the UI.
+
+    The queue is bounded, so a slow UI throttles decompression instead of
+    letting decoded text pile up in memory.
+    """
+    def __init__(self, path):
+        super().__init__(daemon=True)
+        self.path = path
+        self.fmt = default_file_format()
+        self.lone_lf = array("l")
+        # Hashes of the lines as loaded, the disk side of the tab's diff
+        self.line_hashes = array("q")
+        self.chunks = queue.Queue(maxsize=LOAD_QUEUE_CHUNKS)
+        self.error = None
+        self.cancelled = False
+
+    def run(self):
+        try:
+            tail = []  # pieces of a line not finished yet
+            for chunk in iter_text_file(self.path, self.fmt, self.lone_lf):
+                lines = chunk.split("\n")
+                if len(lines) > 1:
+                    lines[0] = "".join(tail) + lines[0]
+                    tail = []
+                    self.line_hashes.extend(map(hash, lines[:-1]))
+                tail.append(lines[-1])
+                if not self.put(chunk):
+                    return
+            self.line_hashes.append(hash("".join(tail)))
+        except Exception as e:
+            self.error = e
+        self.put(None)
+
+    def put(self, item):
+        while not self.cancelled:
+            try:
+                self.chunks.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def cancel(self):
+        self.cancelled = True
+
+def common_prefix_length(a, b, block=65536):
+    n = min(len(a), len(b))
+    i = 0
+    # Skip equal blocks with slice compares, then walk the first block that differs
+    while i + block <= n and a[i:i + block] == b[i:i + block]:
+        i += block
+    while i < n and a[i] == b[i]:
+        i += 1
+    return i
+
+def common_suffix_length(a, b, limit, block=65536):
+    la, lb = len(a), len(b)
+    i = 0
+    while i + block <= limit and a[la - i - block:la - i] == b[lb - i - block:lb - i]:
+        i += block
+    while i < limit and a[la - i - 1] == b[lb - i - 1]:
+        i += 1
+    return i
+
+def format_to_json(fmt):
+    return dict(fmt, bom=fmt["bom"].hex())
+
+def format_from_json(data):
+    fmt = default_file_format()
+    fmt.update(data)
+    fmt["bom"] = bytes.fromhex(fmt["bom"])
+    return fmt
+
+class RecoveryWriter(threading.Thread):
+    """Background writer for all tabs' recovery logs.
+
+    The UI thread only enqueues requests, so logging never blocks typing.
+    Each log is ``<id>.log``: a JSON header line followed by one JSON line per
+    edit. Compaction writes ``<id>.<generation>.snap`` first and only then
+    points the log header at it, so a crash at any step leaves a usable pair.
+    """
+    def __init__(self, directory=RECOVERY_DIR):
+        super().__init__(daemon=True)
+        self.directory = directory
+        self.requests = queue.Queue()
+
+    def put(self, *request):
+        self.requests.put(request)
+
+    def stop(self, timeout=2.0):
+        self.requests.put(None)
+        self.join(timeout)
+
+    def run(self):
+        self.lock_session()
+        while True:
+            request = self.requests.get()
+            if request is None:
+                self.unlock_session()
+                return
+            try:
+                self.handle(*request)
+            except OSError:
+                # Recovery is best effort; a full disk must not take the editor down
+                pass
+
+    def lock_session(self):
+        # Held until exit; other instances take a held lock to mean this session is alive
+        self.lock = None
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.lock = open(self.path(str(os.getpid()), ".lock"), "a+")
+            lock_file(self.lock)
+        except OSError:
+            pass
+
+    def unlock_session(self):
+        if self.lock:
+            self.lock.close()
+            try:
+                os.remove(self.lock.name)
+            except OSError:
+                pass
+
+    def path(self, log_id, suffix):
+        return os.path.join(self.directory, log_id + suffix)
+
+    def handle(self, action, log_id, *payload):
+        log_path = self.path(log_id, ".log")
+        if action == "start":
+            os.makedirs(self.directory, exist_ok=True)
+            self.write_log_header(log_path, payload[0])
+        elif action == "append":
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(record) + "\n" for record in payload[0])
+        elif action == "snapshot":
+            header, content = payload
+            snap_path = self.path(log_id, f".{header['snapshot']}.snap")
+            with open(snap_path + ".tmp", "w", encoding="utf-8", errors="surrogatepass", newline="") as f:
+                f.write(content)
+            os.replace(snap_path + ".tmp", snap_path)
+            self.write_log_header(log_path, header)
+            self.remove_snapshots(log_id, keep=snap_path)
+        elif action == "discard":
+            if os.path.exists(log_path):
+                os.remove(log_path)
+            self.remove_snapshots(log_id)
+
+    def write_log_header(self, log_path, header):
+        with open(log_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(json.dumps(header) + "\n")
+        os.replace(log_path + ".tmp", log_path)
+
+    def remove_snapshots(self, log_id, keep=None):
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith(log_id + ".") and name.endswith(".snap") and path != keep:
+                os.remove(path)
+
+def lock_file(f):
+    """Take a non-blocking exclusive lock on an open file; False if another process holds it."""
+    try:
+        if sys.platform.startswith("win"):
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+def session_alive(pid, directory=RECOVERY_DIR):
+    """Whether the session that wrote logs as ``pid`` is still running (holds its lock file)."""
+    if pid == os.getpid():
+        return False
+    path = os.path.join(directory, f"{pid}.lock")
+    if not os.path.exists(path):
+        return False
+    try:
+        with open(path, "a+") as f:
+            # Closing the file drops the lock we may have just taken
+            alive = not lock_file(f)
+    except OSError:
+        return False
+    if not alive:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return alive
+
+def load_recovery_logs(directory=RECOVERY_DIR):
+    """Yield (log_id, header, records, snapshot_text) for every log left by a dead session."""
+    if not os.path.isdir(directory):
+        return
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".log"):
+            continue
+        log_id = name[:-len(".log")]
+        pid = log_id.split("-", 1)[0]
+        if pid.isdigit() and session_alive(int(pid), directory):
+            continue
+        records = []
+        try:
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                if not isinstance(header, dict):
+                    # Not a log we can trust (e.g. appended to after its header was removed)
+                    continue
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # The last line may have been cut short by the crash
+                        break
+            snapshot = None
+            if header["base"] == "snapshot":
+                snap_path = os.path.join(directory, f"{log_id}.{header['snapshot']}.snap")
+                with open(snap_path, encoding="utf-8", errors="surrogatepass", newline="") as f:
+                    snapshot = f.read()
+        except (OSError, ValueError, KeyError):
+            continue
+        yield log_id, header, records, snapshot
+
+class RecoveryLog:
+    """Write-ahead log of one tab's edits since it was last clean.
+
+    Deltas are batched and flushed every RECOVERY_FLUSH_MS; once the log
+    outgrows the document it is compacted into a snapshot, so disk I/O stays
+    proportional to what was typed.
+    """
+    def __init__(self, tab, writer):
+        self.tab = tab
+        self.writer = writer
+        # The pid prefix keeps a second running instance from adopting our logs
+        self.id = f"{os.getpid()}-{uuid.uuid4().hex}"
+        self.pending = []
+        self.started = False
+        self.paused = False
+        self.flush_scheduled = False
+        self.logged = 0
+        self.compact_at = RECOVERY_COMPACT_BYTES
+        self.generation = 0
+
+    def header(self, base):
+        tab = self.tab
+        return {"title": tab.title, "path": tab.path, "base": base, "mtime": tab.disk_mtime,
+                "snapshot": self.generation, "format": format_to_json(tab.file_format)}
+
+    def on_delta(self, op, start, end, text):
+        if self.paused:
+            return
+        if not self.started:
+            # The log's base is whatever the buffer was when it was last clean
+            self.started = True
+            base = "file" if self.tab.path and self.tab.disk_mtime is not None else "empty"
+            if base == "file":
+                self.compact_at = max(RECOVERY_COMPACT_BYTES, self.tab.disk_size // 2)
+            self.writer.put("start", self.id, self.header(base))
+        self.pending.append(["i", start, text] if op == "insert" else ["d", start, end])
+        self.logged += len(text) + 32
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            self.tab.frame.after(RECOVERY_FLUSH_MS, self.flush)
+
+    def flush(self):
+        self.flush_scheduled = False
+        if not self.started:
+            return
+        if self.logged > self.compact_at:
+            self.compact()
+        elif self.pending:
+            self.writer.put("append", self.id, self.pending)
+            self.pending = []
+
+    def compact(self):
+        # The snapshot already contains every pending delta
+        content = self.tab.get_content()
+        self.generation += 1
+        self.started = True
+        self.pending = []
+        self.logged = 0
+        self.compact_at = max(RECOVERY_COMPACT_BYTES, len(content) // 2)
+        self.writer.put("snapshot", self.id, self.header("snapshot"), content)
+
+    def discard(self):
+        # Called whenever the buffer matches its base again (load, save, close)
+        self.pending = []
+        self.logged = 0
+        if self.started:
+            self.started = False
+            self.writer.put("discard", self.id)
+
+def hash_lines(text):
+    return array("q", map(hash, text.split("\n")))
+
+def _middle_snake(a, alo, ahi, b, blo, bhi, max_cost):
+    """Find the middle snake of a/b[lo:hi] (Myers' linear-space refinement).
+
+    Returns (x, y, u, v, True) relative to alo/blo. Once the edit distance
+    exceeds max_cost it gives up and returns the furthest-reaching non-empty
+    forward snake seen so far as (x, y, u, v, False), all zero if none.
+    """
+    n, m = ahi - alo, bhi - blo
+    delta = n - m
+    odd = delta & 1
+    max_d = min((n + m + 1) // 2, max_cost)
+    offset = max_d + 1
+    vf = [0] * (2 * offset + 1)
+    vb = [0] * (2 * offset + 1)
+    best = (0, 0, 0, 0)
+    for d in range(max_d + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and vf[offset + k - 1] < vf[offset + k + 1]):
+                x = vf[offset + k + 1]
+            else:
+                x = vf[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+            vf[offset + k] = x
+            if odd and abs(delta - k) <= d - 1 and x + vb[offset + delta - k] >= n:
+                return x0, y0, x, y, True
+            if x > x0 and y0 >= 0 and x <= n and y <= m and x + y > best[2] + best[3]:
+                best = (x0, y0, x, y)
+        for k in range(-d, d + 1, 2):
+            # Backward pass runs over the reversed sequences; its diagonal k is forward diagonal delta - k
+            if k == -d or (k != d and vb[offset + k - 1] < vb[offset + k + 1]):
+                x = vb[offset + k + 1]
+            else:
+                x = vb[offset + k - 1] + 1
+            y = x - k
+            x0, y0 = x, y
+            while x < n and y < m and a[ahi - 1 - x] == b[bhi - 1 - y]:
+                x += 1
+                y += 1
+            vb[offset + k] = x
+            if not odd and abs(delta - k) <= d and x + vf[offset + delta - k] >= n:
+                return n - x, m - y, n - x0, m - y0, True
+    return best + (False,)
+
+def _unique_anchors(a, alo, ahi, b, blo, bhi):
+    """Patience diff: pairs (i, j) of lines occurring once on each side, increasing in both."""
+    a_at, b_at = {}, {}
+    for i in range(alo, ahi):
+        a_at[a[i]] = -1 if a[i] in a_at else i
+    for j in range(blo, bhi):
+        b_at[b[j]] = -1 if b[j] in b_at else j
+    candidates = [(i, b_at[line]) for line, i in a_at.items() if i >= 0 and b_at.get(line, -1) >= 0]
+    candidates.sort()
+    # Longest increasing run of j, by patience sorting
+    tops, top_j, back = [], [], []
+    for n, (i, j) in enumerate(candidates):
+        pile = bisect.bisect_left(top_j, j)
+        back.append(tops[pile - 1] if pile else -1)
+        if pile == len(tops):
+            tops.append(n)
+            top_j.append(j)
+        else:
+            tops[pile] = n
+            top_j[pile] = j
+    anchors = []
+    n = tops[-1] if tops else -1
+    while n >= 0:
+        anchors.append(candidates[n])
+        n = back[n]
+    anchors.reverse()
+    return anchors
+
+def _match_lines(a, alo, ahi, b, blo, bhi, pairs, max_cost):
+    while alo < ahi and blo < bhi and a[alo] == b[blo]:
+        pairs.append((alo, blo))
+        alo += 1
+        blo += 1
+    suffix = 0
+    while alo < ahi - suffix and blo < bhi - suffix and a[ahi - 1 - suffix] == b[bhi - 1 - suffix]:
+        suffix += 1
+    ahi -= suffix
+    bhi -= suffix
+    if alo < ahi and blo < bhi:
+        x, y, u, v, complete = _middle_snake(a, alo, ahi, b, blo, bhi, max_cost)
+        anchors = [] if complete else _unique_anchors(a, alo, ahi, b, blo, bhi)
+        if anchors:
+            # Too costly to diff in one go: split on lines unique to both sides
+            i0, j0 = alo, blo
+            for i, j in anchors:
+                if i > i0 or j > j0:
+                    _match_lines(a, i0, i, b, j0, j, pairs, max_cost)
+                pairs.append((i, j))
+                i0, j0 = i + 1, j + 1
+            _match_lines(a, i0, ahi, b, j0, bhi, pairs, max_cost)
+        elif complete or u > x:
+            # Split at the middle snake, or at the furthest snake reached within max_cost
+            _match_lines(a, alo, alo + x, b, blo, blo + y, pairs, max_cost)
+            pairs.extend((alo + x + i, blo + y + i) for i in range(u - x))
+            _match_lines(a, alo + u, ahi, b, blo + v, bhi, pairs, max_cost)
+        # Otherwise nothing lines up: the region shows as one replace
+    pairs.extend((ahi + i, bhi + i) for i in range(suffix))
+
+def diff_lines(a, b, max_cost=DIFF_MAX_COST):
+    """Diff two sequences of line hashes; returns difflib-style opcodes."""
+    prefix = common_prefix_length(a, b)
+    suffix = common_suffix_length(a, b, min(len(a), len(b)) - prefix)
+    pairs = []
+    _match_lines(a, prefix, len(a) - suffix, b, prefix, len(b) - suffix, pairs, max_cost)
+    opcodes = []
+    i = j = 0
+    if prefix:
+        opcodes.append(("equal", 0, prefix, 0, prefix))
+        i = j = prefix
+    # Sentinel flushes the last change region before the common suffix
+    for ai, bj in pairs + [(len(a) - suffix, len(b) - suffix)]:
+        if i < ai or j < bj:
+            tag = "replace" if i < ai and j < bj else "delete" if i < ai else "insert"
+            opcodes.append((tag, i, ai, j, bj))
+        if ai < len(a) - suffix:
+            if opcodes and opcodes[-1][0] == "equal":
+                opcodes[-1] = ("equal", opcodes[-1][1], ai + 1, opcodes[-1][3], bj + 1)
+            else:
+                opcodes.append(("equal", ai, ai + 1, bj, bj + 1))
+        i, j = ai + 1, bj + 1
+    if suffix:
+        opcodes.append(("equal", len(a) - suffix, len(a), len(b) - suffix, len(b)))
+    return opcodes
+
+def line_changes(opcodes, new_len):
+    """Map 1-based line numbers of the new side to added/modified/deleted."""
+    marks = {}
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "insert":
+            marks.update(dict.fromkeys(range(j1 + 1, j2 + 1), "added"))
+        elif tag == "replace":
+            marks.update(dict.fromkeys(range(j1 + 1, j2 + 1), "modified"))
+        elif tag == "delete":
+            # Deleted lines are flagged on the line that now follows them
+            marks.setdefault(min(j1 + 1, max(new_len, 1)), "deleted")
+    return marks
+
+def group_opcodes(opcodes, context=DIFF_CONTEXT):
+    """Split opcodes into hunks with up to `context` equal lines around each change."""
+    hunk = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            if not hunk:
+                hunk.append(("equal", max(i1, i2 - context), i2, max(j1, j2 - context), j2))
+                continue
+            if i2 - i1 > 2 * context:
+                hunk.append(("equal", i1, i1 + context, j1, j1 + context))
+                yield hunk
+                hunk = [("equal", i2 - context, i2, j2 - context, j2)]
+                continue
+        hunk.append((tag, i1, i2, j1, j2))
+    if hunk and not (len(hunk) == 1 and hunk[0][0] == "equal"):
+        if hunk[-1][0] == "equal":
+            tag, i1, i2, j1, j2 = hunk[-1]
+            hunk[-1] = ("equal", i1, min(i2, i1 + context), j1, min(j2, j1 + context))
+        yield hunk
+
+def diff_window(opcodes, ends, lo, hi):
+    """Where to re-diff once lines [lo, hi) of the new side of opcodes changed.
+
+    The window reaches one line past the change on each side, widened to
+    whole change opcodes. ends holds each opcode's new-side end. Returns
+    (k, a_lo, b_lo, k2, a_hi, b_hi), where opcodes k..k2 are the ones it cuts.
+    """
+    lo, hi = max(lo - 1, 0), min(hi + 1, opcodes[-1][4])
+    k = bisect.bisect_left(ends, lo)
+    if opcodes[k][0] == "equal" and opcodes[k][4] == lo:
+        k += 1
+    tag, i1, i2, j1, j2 = opcodes[k]
+    a_lo, b_lo = (i1 + lo - j1, lo) if tag == "equal" else (i1, j1)
+    k2 = k
+    while k2 + 1 < len(opcodes) and opcodes[k2 + 1][3] <= hi:
+        k2 += 1
+    tag, i1, i2, j1, j2 = opcodes[k2]
+    a_hi, b_hi = (i1 + hi - j1, hi) if tag == "equal" else (i2, j2)
+    return k, a_lo, b_lo, k2, a_hi, b_hi
+
+def splice_opcodes(opcodes, window, middle, shift):
+    """Replace the window of opcodes by middle, the diff of its contents.
+
+    Lines after the window move by shift on the new side.
+    """
+    k, a_lo, b_lo, k2, a_hi, b_hi = window
+    out = opcodes[:k]
+    tag, i1, i2, j1, j2 = opcodes[k]
+    if tag == "equal" and b_lo > j1:
+        out.append(("equal", i1, a_lo, j1, b_lo))
+    out.extend((tag, i1 + a_lo, i2 + a_lo, j1 + b_lo, j2 + b_lo) for tag, i1, i2, j1, j2 in middle)
+    tag, i1, i2, j1, j2 = opcodes[k2]
+    if tag == "equal" and b_hi < j2:
+        out.append(("equal", a_hi, i2, b_hi + shift, j2 + shift))
+    out.extend((tag, i1, i2, j1 + shift, j2 + shift) for tag, i1, i2, j1, j2 in opcodes[k2 + 1:])
+    merged = []
+    for op in out:
+        if merged and op[0] == merged[-1][0] == "equal":
+            merged[-1] = ("equal", merged[-1][1], op[2], merged[-1][3], op[4])
+        else:
+            merged.append(op)
+    return merged
+
+class DiffTracker:
+    """Added/modified/deleted line marks of a tab against its file on disk.
+
+    Both sides are kept as arrays of line hashes. The buffer's array is
+    patched from the tab's deltas, and only the edited lines are rehashed.
+    After a debounce, a worker thread re-diffs just the region around the
+    edits and splices it into the previous opcodes.
+    """
+    def __init__(self, tab):
+        self.tab = tab
+        self.base = None
+        self.lines = None
+        self.opcodes = []
+        self.ends = []
+        self.marks = {}
+        self.dirty = None  # [lo, hi) 0-based lines edited since the last diff started
+        self.job = None
+        self.worker = None
+        self.result = None
+        self.pending = False
+        self.generation = 0
+
+    def set_base(self, hashes=None):
+        """Diff against the given line hashes, or against the buffer as it is now."""
+        if hashes is None:
+            self.rehash()
+            hashes = self.lines if self.lines is not None else hash_lines(self.tab.get_content())
+        self.base = array("q", hashes)
+        self.lines = array("q", hashes)
+        self.opcodes = [("equal", 0, len(hashes), 0, len(hashes))]
+        self.ends = [len(hashes)]
+        self.marks = {}
+        self.dirty = None
+        # A diff still running was against the old base
+        self.generation += 1
+        if self.job:
+            self.tab.frame.after_cancel(self.job)
+            self.job = None
+        self.tab.update_line_numbers()
+
+    def on_delta(self, op, start, end, text):
+        if self.lines is None:
+            return
+        first, removed, added = delta_line_span(op, start, end, text)
+        lo = first - 1
+        # Edited lines get placeholder hashes until the next diff rehashes them
+        self.lines[lo:lo + removed + 1] = array("q", bytes(8 * (added + 1)))
+        hi = lo + added + 1
+        if self.dirty:
+            a, b = self.dirty
+            if b >= lo + removed + 1:
+                b += added - removed
+            self.dirty = [min(a, lo), max(b, hi)]
+        else:
+            self.dirty = [lo, hi]
+        self.schedule()
+
+    def schedule(self):
+        if self.job:
+            self.tab.frame.after_cancel(self.job)
+        self.job = self.tab.frame.after(DIFF_DEBOUNCE_MS, self.start)
+
+    def rehash(self):
+        if self.dirty:
+            lo, hi = self.dirty
+            self.lines[lo:hi] = hash_lines(self.tab.text.get(f"{lo + 1}.0", f"{hi}.end"))
+
+    def start(self):
+        self.job = None
+        if self.worker:
+            self.pending = True
+            return
+        if not self.dirty:
+            return
+        self.rehash()
+        lo, hi = self.dirty
+        self.dirty = None
+        shift = len(self.lines) - self.opcodes[-1][4]
+        # The window is found in the last diff's coordinates, where the edited lines ended at hi - shift
+        window = diff_window(self.opcodes, self.ends, lo, hi - shift)
+        k, a_lo, b_lo, k2, a_hi, b_hi = window
+        args = (self.generation, self.opcodes, window, self.base[a_lo:a_hi], self.lines[b_lo:b_hi + shift], shift)
+        self.worker = threading.Thread(target=self.compute, args=args, daemon=True)
+        self.worker.start()
+        self.tab.frame.after(DIFF_POLL_MS, self.poll)
+
+    def compute(self, generation, opcodes, window, a, b, shift):
+        opcodes = splice_opcodes(opcodes, window, diff_lines(a, b), shift)
+        self.result = generation, opcodes, [op[4] for op in opcodes], line_changes(opcodes, opcodes[-1][4])
+
+    def poll(self):
+        if self.worker.is_alive():
+            self.tab.frame.after(DIFF_POLL_MS, self.poll)
+            return
+        self.worker = None
+        generation, opcodes, ends, marks = self.result
+        if generation == self.generation:
+            self.opcodes, self.ends, self.marks = opcodes, ends, marks
+            self.tab.update_line_numbers()
+        if self.pending or self.dirty:
+            self.pending = False
+            self.start()
+
+def regex_search_worker(text, mode, pattern, flags, pos, replacement, emit):
+    """Run one search job in the child; emits ("matches", batch) then ("done", None)."""
+    try:
+        pat = re.compile(pattern, flags)
+        if mode == "next":
+            m = pat.search(text, pos) or pat.search(text)
+            emit("matches", [(m.start(), m.end())] if m else [])
+        elif mode == "prev":
+            # Last match before the cursor, wrapping to the last one overall
+            last = None
+            for endpos in (pos, len(text)):
+                for last in pat.finditer(text, 0, endpos):
+                    pass
+                if last:
+                    break
+            emit("matches", [(last.start(), last.end())] if last else [])
+        else:
+            batch = []
+            for m in pat.finditer(text):
+                batch.append((m.start(), m.end(), m.expand(replacement)))
+                if len(batch) >= SEARCH_BATCH:
+                    emit("matches", batch)
+                    batch = []
+            emit("matches", batch)
+    except Exception as e:
+        emit("error", str(e))
+    emit("done", None)
+
+def filter_lines_worker(text, stages, numbers, emit):
+    """Emit those of ``numbers``, the line numbers of ``text``, whose lines pass every (pattern, flags, hide) stage."""
+    try:
+        compiled = [(re.compile(pattern, flags), hide) for pattern, flags, hide in stages]
+        emit("matches", [n for n, line in zip(numbers, text.split("\n"))
+                         if all(bool(pat.search(line)) != hide for pat, hide in compiled)])
+    except Exception as e:
+        emit("error", str(e))
+    emit("done", None)
+
+def search_worker_loop(requests, results):
+    """Main loop of the SearchWorker child: runs jobs until it receives None.
+
+    The last buffer snapshot is kept, so a job on unchanged text is sent
+    without it.
+    """
+    snapshot_key, snapshot = None, ""
+    for job_id, key, text, mode, args in iter(requests.get, None):
+        if text is not None:
+            snapshot_key, snapshot = key, text
+        elif key != snapshot_key:
+            results.put((job_id, "error", "search snapshot lost"))
+            results.put((job_id, "done", None))
+            continue
+        results.put((job_id, "started", None))
+        emit = lambda kind, payload: results.put((job_id, kind, payload))
+        if mode == "lines":
+            filter_lines_worker(snapshot, *args, emit)
+        else:
+            regex_search_worker(snapshot, mode, *args, emit)
+
+class SearchWorker:
+    """A long-lived child process that runs regex jobs one at a time.
+
+    Spawning an interpreter per search cost more than most searches, so the
+    process is reused and only replaced after a job had to be killed. Jobs
+    and their snapshots go through a multiprocessing queue, whose feeder
+    thread does the pickling off the Tk thread.
+    """
+    def __init__(self):
+        # spawn, not fork: the parent has Tk and background threads running
+        self.ctx = multiprocessing.get_context("spawn")
+        self.process = None
+        self.job_id = 0
+        self.snapshot_key = None
+
+    def ensure(self):
+        if self.process is None or not self.process.is_alive():
+            self.kill()
+            self.requests = self.ctx.Queue()
+            # Written synchronously: a Queue's feeder thread would starve while a pattern holds the GIL
+            self.results = self.ctx.SimpleQueue()
+            self.process = self.ctx.Process(target=search_worker_loop, args=(self.requests, self.results),
+                                            daemon=True)
+            self.process.start()
+
+    def has_snapshot(self, key):
+        return self.process is not None and self.process.is_alive() and key == self.snapshot_key
+
+    def submit(self, key, text, mode, args):
+        self.ensure()
+        if text is None and key != self.snapshot_key:
+            raise ValueError("no snapshot for this search")
+        self.snapshot_key = key
+        self.job_id += 1
+        self.requests.put((self.job_id, key, text, mode, args))
+        return self.job_id
+
+    def alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def kill(self):
+        if self.process is None:
+            return
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join(1)
+        # A snapshot may still be in the pipe; don't wait for it at exit
+        self.requests.cancel_join_thread()
+        self.requests.close()
+        self.results.close()
+        self.process = None
+        self.snapshot_key = None
+
+class RegexSearch:
+    """A regex job on a SearchWorker, polled from the Tk loop.
+
+    ``mode`` is "next", "prev" or "all" with args (pattern, flags, pos,
+    replacement), or "lines" with args (stages, line numbers) for a line
+    filter. Matches stream back in batches. The time budget counts from when the
+    child starts matching; when it runs out or the search is cancelled the
+    worker is killed, so a catastrophic pattern costs a process, not the
+    editor. Matches found until then are passed to ``on_done``.
+    """
+    def __init__(self, worker, widget, key, text, mode, args, budget=SEARCH_TIME_BUDGET,
+                 on_progress=None, on_done=None):
+        self.worker = worker
+        self.widget = widget
+        self.matches = []
+        self.finished = False
+        self.budget = budget
+        self.deadline = None
+        self.on_progress = on_progress
+        self.on_done = on_done
+        self.job = worker.submit(key, text, mode, args)
+        self.widget.after(SEARCH_POLL_MS, self.poll)
+
+    def poll(self):
+        if self.finished:
+            return
+        while not self.worker.results.empty():
+            job, kind, payload = self.worker.results.get()
+            if job != self.job:
+                continue
+            if kind == "started":
+                self.deadline = time.monotonic() + self.budget
+            elif kind == "matches":
+                self.matches.extend(payload)
+                if payload and self.on_progress:
+                    self.on_progress(len(self.matches))
+            else:
+                self.finish(payload)
+                return
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self.finish("timeout")
+            return
+        if not self.worker.alive():
+            self.finish("search process exited")
+            return
+        self.widget.after(SEARCH_POLL_MS, self.poll)
+
+    def cancel(self):
+        self.finish("cancelled")
+
+    def finish(self, error):
+        if self.finished:
+            return
+        self.finished = True
+        if error is not None:
+            # The child may still be stuck in the pattern
+            self.worker.kill()
+        if self.on_done:
+            self.on_done(self.matches, error)
+
+class SpillStack:
+    """Undo groups pickled to a temp file, popped newest first so the file only shrinks from the end."""
+    def __init__(self):
+        self.file = None
+        self.offsets = []
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def push(self, group):
+        if self.file is None:
+            self.file = tempfile.TemporaryFile()
+        self.file.seek(0, os.SEEK_END)
+        self.offsets.append(self.file.tell())
+        pickle.dump(group, self.file, pickle.HIGHEST_PROTOCOL)
+
+    def pop(self):
+        offset = self.offsets.pop()
+        self.file.seek(offset)
+        group = pickle.load(self.file)
+        self.file.truncate(offset)
+        return group
+
+    def close(self):
+        self.offsets = []
+        if self.file:
+            self.file.close()
+            self.file = None
+
+class UndoJournal:
+    """Editor-owned undo history built from compact deltas.
+
+    A delta is [op, start, end, text] with Tk indexes valid at the time of the
+    edit. Edits made during one Tk event form a group; consecutive typing is
+    coalesced into word-sized groups. Once the history holds more than
+    ``limit`` characters, groups furthest from the current state are spilled
+    to a temp file (or dropped when spilling is off): the far end of the
+    redo stack first, then the oldest undo groups.
+    """
+    def __init__(self, limit=UNDO_MEMORY_LIMIT, spill=UNDO_SPILL):
+        self.limit = limit
+        self.spill = spill
+        self.undo_stack = collections.deque()
+        self.redo_stack = []
+        self.size = 0
+        self.group_open = False
+        self.suspended = False
+        self.undo_spill = SpillStack()
+        self.redo_spill = SpillStack()
+
+    def record(self, op, start, end, text):
+        delta = [op, start, end, text]
+        self.drop_redo()
+        self.size += len(text)
+        if self.group_open or self.continues_typing(delta):
+            group = self.undo_stack[-1]
+            if not self.merge(group[-1], delta):
+                group.append(delta)
+                self.size += DELTA_OVERHEAD
+        else:
+            self.undo_stack.append([delta])
+            self.size += DELTA_OVERHEAD
+        self.group_open = True
+        self.enforce_limit(keep=1)
+
+    def continues_typing(self, delta):
+        # Single keystrokes extend the previous single-delta group up to a word boundary
+        if not self.undo_stack or len(delta[3]) != 1 or delta[3] == "\n":
+            return False
+        group = self.undo_stack[-1]
+        if len(group) != 1:
+            return False
+        prev = group[0]
+        if prev[0] != delta[0] or "\n" in prev[3]:
+            return False
+        if delta[0] == "insert":
+            return prev[2] == delta[1] and not (delta[3].isspace() and not prev[3][-1].isspace())
+        return prev[1] == delta[2] and not (delta[3].isspace() and not prev[3][0].isspace())
+
+    def merge(self, prev, delta):
+        if prev[0] == delta[0] == "insert" and prev[2] == delta[1]:
+            prev[2] = delta[2]
+            prev[3] += delta[3]
+            return True
+        if prev[0] == delta[0] == "delete" and prev[1] == delta[2]:
+            # Backspace: the new range ends where the previous one started
+            prev[1] = delta[1]
+            prev[3] = delta[3] + prev[3]
+            return True
+        return False
+
+    def close_group(self):
+        self.group_open = False
+        self.enforce_limit(keep=0)
+
+    def undo(self):
+        self.close_group()
+        if not self.undo_stack and self.undo_spill:
+            self.undo_stack.append(self.unspill(self.undo_spill))
+        if not self.undo_stack:
+            return None
+        group = self.undo_stack.pop()
+        self.redo_stack.append(group)
+        self.enforce_limit(keep=0)
+        return group
+
+    def redo(self):
+        self.close_group()
+        if not self.redo_stack and self.redo_spill:
+            self.redo_stack.append(self.unspill(self.redo_spill))
+        if not self.redo_stack:
+            return None
+        group = self.redo_stack.pop()
+        self.undo_stack.append(group)
+        self.enforce_limit(keep=0)
+        return group
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack = []
+        self.size = 0
+        self.group_open = False
+        self.undo_spill.close()
+        self.redo_spill.close()
+
+    def drop_redo(self):
+        for group in self.redo_stack:
+            self.size -= self.group_size(group)
+        self.redo_stack = []
+        self.redo_spill.close()
+
+    def group_size(self, group):
+        return sum(len(d[3]) + DELTA_OVERHEAD for d in group)
+
+    def enforce_limit(self, keep):
+        # The group redone last is the one least likely to be needed
+        while self.size > self.limit and self.redo_stack:
+            group = self.redo_stack.pop(0)
+            self.size -= self.group_size(group)
+            if self.spill:
+                self.redo_spill.push(group)
+        while self.size > self.limit and len(self.undo_stack) > keep:
+            group = self.undo_stack.popleft()
+            self.size -= self.group_size(group)
+            if self.spill:
+                self.undo_spill.push(group)
+
+    def unspill(self, spill):
+        group = spill.pop()
+        self.size += self.group_size(group)
+        return group
+
+class PeerText(tk.Text):
+    """A Text widget made with `peer create`, sharing another widget's content."""
+    def __init__(self, master, peer_of, **kw):
+        self.widgetName = "text"
+        self._setup(master, {})
+        peer_of.tk.call(str(peer_of), "peer", "create", self._w, *self._options(kw))
+
+class EditorView:
+    """Gutter, text widget and scrollbar showing a tab's document.
+
+    The first view of a tab owns the Tk text; later ones are peers of it, so
+    content, tags, undo and indexes exist once while scroll position, cursor
+    and selection stay per view.
+    """
+    def __init__(self, tab, master, like=None):
+        self.tab = tab
+        self.frame = ttk.Frame(master)
+        self.line_numbers = tk.Text(self.frame, width=5, padx=4, takefocus=0,
+                                    state="disabled", background="#2b2b2b", foreground="#9aa0a6",
+                                    borderwidth=0, highlightthickness=0)
+        # Undo is handled by the tab's own journal, fed through the widget proxy
+        options = dict(undo=False, wrap=tab.wrap, borderwidth=0, highlightthickness=0)
+        if like is None:
+            self.text = tk.Text(self.frame, **options)
+        else:
+            self.text = PeerText(self.frame, like.text, **options)
+            for option in ("font", "background", "foreground", "insertbackground", "state"):
+                self.text.configure({option: like.text.cget(option)})
+            for option in ("font", "background", "foreground"):
+                self.line_numbers.configure({option: like.line_numbers.cget(option)})
+        tab.install_proxy(self.text)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.on_scrollbar)
+        self.text.configure(yscrollcommand=self.on_textscroll)
+
+        self.frame.columnconfigure(1, weight=1)
+        self.frame.rowconfigure(0, weight=1)
+        self.line_numbers.grid(row=0, column=0, sticky="nsew")
+        self.text.grid(row=0, column=1, sticky="nsew")
+        self.scrollbar.grid(row=0, column=2, sticky="ns")
+        if like is not None and not like.line_numbers.winfo_manager():
+            # Line numbers are hidden in the view we were made from
+            self.line_numbers.grid_remove()
+
+        # Gutter change markers against the file on disk
+        self.line_numbers.tag_configure("diff_added", background="#2e5c2e", foreground="#ffffff")
+        self.line_numbers.tag_configure("diff_modified", background="#2e4a6b", foreground="#ffffff")
+        self.line_numbers.tag_configure("diff_deleted", background="#6b2e2e", foreground="#ffffff")
+
+    def on_scrollbar(self, *args):
+        self.text.yview(*args)
+        self.update_line_numbers()
+
+    def on_textscroll(self, *args):
+        self.scrollbar.set(*args)
+        self.update_line_numbers()
+
+    def visible_lines(self):
+        start = self.text.index("@0,0")
+        end = self.text.index("@0,%d" % self.text.winfo_height())
+        return int(start.split(".")[0]), int(end.split(".")[0]) + 1
+
+    def update_line_numbers(self):
+        # Display current visible line numbers
+        self.line_numbers.config(state="normal")
+        self.line_numbers.delete("1.0", tk.END)
+        start_line, end_line = self.visible_lines()
+
+        lines = "\n".join(str(i) for i in range(start_line, end_line))
+        self.line_numbers.insert("1.0", lines)
+        marks = self.tab.diff.marks
+        for i in range(start_line, end_line):
+            if i in marks:
+                row = i - start_line + 1
+                self.line_numbers.tag_add("diff_" + marks[i], f"{row}.0", f"{row}.end+1c")
+        self.line_numbers.config(state="disabled")
+
+    def destroy(self):
+        name = str(self.text)
+        self.frame.destroy()
+        # Our proxy commands outlive the widget; drop them too
+        for command in (name, name + "_py"):
+            try:
+                self.text.tk.deletecommand(command)
+            except tk.TclError:
+                pass
+
+def delta_line_span(op, start, end, text):
+    """Lines an edit touches: old lines first..first+removed become first..first+added."""
+    first = int(start.split(".")[0])
+    if op == "insert":
+        return first, 0, text.count("\n")
+    return first, int(end.split(".")[0]) - first, 0
+
+class LineIndex:
+    """Sorted numbers of the lines of a tab that ``scan`` accepts, kept current from its deltas.
+
+    ``scan(line)`` returns None to skip a line, or a value that is kept next
+    to its line number when ``keep_values`` is set. Alternatively
+    ``scan_async(numbers, text, done, narrow)`` scans the lines of ``text``,
+    numbered by ``numbers``, elsewhere and later calls ``done`` with the
+    accepted line numbers; ``narrow()`` then re-tests just the entries with
+    ``narrow`` set and drops the ones rejected. Given ``lines`` up front
+    instead, it never scans and just keeps them current. The buffer is scanned a
+    chunk at a time from the Tk loop; after an edit only the edited lines are
+    rescanned and the entries after them renumbered. ``version`` changes
+    whenever entries are added or dropped, but not when they merely shift.
+    """
+    def __init__(self, tab, scan=None, on_change=None, keep_values=False, scan_async=None, lines=None):
+        self.tab = tab
+        self.scan = scan
+        self.scan_async = scan_async
+        self.on_change = on_change
+        self.lines = array("l")
+        self.values = [] if keep_values else None
+        self.pending = []  # [start, stop) line ranges not scanned yet, never overlapping
+        self.job = None
+        self.narrowing = []  # [start, stop) line ranges whose entries are still to be re-tested
+        self.inflight = None  # [start, stop, stale, narrowing] of the chunk out with scan_async
+        self.stopped = False
+        self.version = 0
+        tab.delta_listeners.append(self.on_delta)
+        if lines is None:
+            self.rebuild()
+        else:
+            self.lines = array("l", lines)
+            self.stopped = True
+
+    def last_line(self):
+        return int(self.tab.text.index("end-1c").split(".")[0])
+
+    def rebuild(self):
+        self.lines = array("l")
+        if self.values is not None:
+            self.values = []
+        self.pending = [[1, self.last_line() + 1]]
+        self.narrowing = []
+        self.stopped = False
+        self.version += 1
+        if self.inflight:
+            self.inflight[2] = True
+        self.schedule()
+
+    def narrow(self):
+        self.narrowing = [[1, self.last_line() + 1]] if self.lines else []
+        # Results still out were tested against less than the entries now need
+        if self.inflight:
+            self.inflight[2] = True
+        self.schedule()
+
+    def stop(self):
+        # Give up scanning; edits still drop and renumber entries but nothing is rescanned
+        self.stopped = True
+        self.pending = []
+        self.narrowing = []
+        self.inflight = None
+        if self.job is not None:
+            self.tab.frame.after_cancel(self.job)
+            self.job = None
+
+    def schedule(self):
+        if self.job is None and self.inflight is None and (self.pending or self.narrowing):
+            self.job = self.tab.frame.after(FILTER_TICK_MS, self.scan_chunk)
+
+    def scan_chunk(self):
+        self.job = None
+        if self.narrowing:
+            self.narrow_chunk()
+            return
+        start, stop = self.pending[0]
+        stop = min(stop, start + FILTER_CHUNK_LINES, self.last_line() + 1)
+        if start >= stop:
+            self.add_found(start, stop, array("l"), [])
+            return
+        chunk = self.tab.text.get(f"{start}.0", f"{stop}.0")
+        if self.scan_async:
+            self.inflight = job = [start, stop, False, False]
+            # Every line comes back newline-terminated; drop the last one so no phantom line is scanned
+            self.scan_async(range(start, stop), chunk[:-1] if chunk.endswith("\n") else chunk,
+                            lambda found: self.on_scanned(job, found), False)
+            return
+        found, values = array("l"), []
+        for i, line in enumerate(chunk.split("\n")[:stop - start]):
+            value = self.scan(line)
+            if value is not None:
+                found.append(start + i)
+                values.append(value)
+        self.add_found(start, stop, found, values)
+
+    def narrow_chunk(self):
+        # Up to a chunk's worth of entries go out, with just their own lines' text
+        start, stop = self.narrowing[0]
+        lo = bisect.bisect_left(self.lines, start)
+        hi = min(bisect.bisect_left(self.lines, stop), lo + FILTER_CHUNK_LINES)
+        if lo == hi:
+            self.drop_rejected(start, stop, [])
+            return
+        numbers = self.lines[lo:hi]
+        if hi < len(self.lines) and self.lines[hi] < stop:
+            stop = numbers[-1] + 1
+        chunk = self.tab.text.get(f"{numbers[0]}.0", f"{numbers[-1]}.end").split("\n")
+        text = "\n".join(chunk[n - numbers[0]] for n in numbers)
+        self.inflight = job = [start, stop, False, True]
+        self.scan_async(list(numbers), text, lambda found: self.on_scanned(job, found), True)
+
+    def on_scanned(self, job, found):
+        if job is not self.inflight:
+            return
+        start, stop, stale, narrowing = job
+        self.inflight = None
+        if stale:
+            # An edit or a new narrowing overlapped the chunk; its lines are still to do
+            self.schedule()
+            return
+        if narrowing:
+            self.drop_rejected(start, stop, found)
+        else:
+            self.add_found(start, stop, array("l", found), [])
+
+    def drop_rejected(self, start, stop, found):
+        lo = bisect.bisect_left(self.lines, start)
+        hi = bisect.bisect_left(self.lines, stop)
+        accepted = set(found)
+        keep = [i for i in range(lo, hi) if self.lines[i] in accepted]
+        if len(keep) < hi - lo:
+            if self.values is not None:
+                self.values[lo:hi] = [self.values[i] for i in keep]
+            self.lines[lo:hi] = array("l", [self.lines[i] for i in keep])
+            self.version += 1
+        self.narrowing[0][0] = stop
+        if stop >= self.narrowing[0][1]:
+            del self.narrowing[0]
+        self.schedule()
+        if self.on_change:
+            self.on_change()
+
+    def add_found(self, start, stop, found, values):
+        if found:
+            at = bisect.bisect_left(self.lines, start)
+            self.lines[at:at] = found
+            if self.values is not None:
+                self.values[at:at] = values
+            self.version += 1
+        for i, r in enumerate(self.pending):
+            if r[0] == start:
+                if stop >= r[1]:
+                    del self.pending[i]
+                else:
+                    r[0] = stop
+                break
+        self.schedule()
+        if self.on_change:
+            self.on_change()
+
+    def on_delta(self, op, start, end, text):
+        first, removed, added = delta_line_span(op, start, end, text)
+        shift = added - removed
+        lo = bisect.bisect_left(self.lines, first)
+        hi = bisect.bisect_right(self.lines, first + removed)
+        if hi > lo:
+            self.version += 1
+            if self.values is not None:
+                del self.values[lo:hi]
+        if shift:
+            self.lines[lo:] = array("l", [n + shift for n in self.lines[hi:]])
+        else:
+            del self.lines[lo:hi]
+        if self.inflight and first < self.inflight[1]:
+            # Results for a chunk at or after the edit would land on the wrong lines
+            self.inflight[2] = True
+        if self.stopped:
+            if self.on_change:
+                self.on_change()
+            return
+
+        def moved(n, inside):
+            if n <= first:
+                return n
+            return n + shift if n > first + removed else inside
+
+        def merged(ranges):
+            out = []
+            for a, b in sorted(r for r in ranges if r[0] < r[1]):
+                if out and a <= out[-1][1]:
+                    out[-1][1] = max(out[-1][1], b)
+                else:
+                    out.append([a, b])
+            return out
+
+        # Unscanned ranges follow the edit; the edited lines themselves are rescanned
+        self.pending = merged([[moved(a, first), moved(b, first + added + 1)] for a, b in self.pending]
+                              + [[first, first + added + 1]])
+        self.narrowing = merged([[moved(a, first), moved(b, first + added + 1)] for a, b in self.narrowing])
+        self.schedule()
+        if self.on_change:
+            self.on_change()
+
+    def close(self):
+        self.stop()
+        if self.on_delta in self.tab.delta_listeners:
+            self.tab.delta_listeners.remove(self.on_delta)
+
+def scan_symbol(line):
+    """(indent, kind, name) for a line opening a class or function, else None."""
+    m = SYMBOL_RE.match(line)
+    if m:
+        return len(m.group(1).expandtabs(8)), m.group(2), m.group(3)
+    return None
+
+def nest_symbols(values):
+    """Yield (depth, parent position, qualified name) per symbol, nesting by indentation."""
+    stack = []  # (indent, position, qualified name)
+    for pos, (indent, kind, name) in enumerate(values):
+        while stack and stack[-1][0] >= indent:
+            stack.pop()
+        parent = stack[-1] if stack else None
+        qualname = f"{parent[2]}.{name}" if parent else name
+        yield len(stack), parent[1] if parent else None, qualname
+        stack.append((indent, pos, qualname))
+
+def fuzzy_score(query, name):
+    """Rank ``name`` for a subsequence match of ``query`` (lower is better), or None."""
+    lowered = name.lower()
+    score, pos = 0, 0
+    for ch in query.lower():
+        i = lowered.find(ch, pos)
+        if i < 0:
+            return None
+        # Gaps cost, except for jumps to the start of a word
+        if i > pos and not (name[i - 1] in "._" or name[i].isupper()):
+            score += i - pos
+        pos = i + 1
+    return score, len(name)
+
+class FilterView:
+    """Read-only window listing the lines of a tab that pass a chain of filters.
+
+    Each stage is (pattern, hide); a line is shown when it passes every stage.
+    Matching line numbers come from a LineIndex whose chunks are matched on
+    the view's own SearchWorker under the find time budget, so a runaway
+    pattern stops the filter, not the editor. A stage added later is only
+    tried on the lines already listed. Only the rows on screen are rendered.
+    """
+    def __init__(self, app, tab, stages):
+        self.app = app
+        self.tab = tab
+        self.stages = list(stages)
+        self.narrowed = len(self.stages)  # stages every listed line is known to pass
+        self.top = 0
+        self.current = 0  # position in index.lines of the selected row
+        self.render_job = None
+        self.worker = SearchWorker()
+        self.request = None
+        self.error = None
+
+        self.window = tk.Toplevel(app.root)
+        self.window.title(f"Filter: {tab.title}")
+        self.window.geometry("800x500")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+        bar = ttk.Frame(self.window)
+        bar.pack(fill="x", padx=6, pady=4)
+        self.chain_label = ttk.Label(bar, anchor="w")
+        self.chain_label.pack(side="left", fill="x", expand=True)
+        self.entry = ttk.Entry(bar, width=24)
+        self.entry.pack(side="left", padx=4)
+        self.entry.bind("<Return>", lambda e: self.add_stage())
+        self.hide_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(bar, text="Hide matches", variable=self.hide_var).pack(side="left")
+        ttk.Button(bar, text="Add Filter", command=self.add_stage).pack(side="left", padx=4)
+        ttk.Button(bar, text="Stop", command=lambda: self.stop("cancelled")).pack(side="left")
+        self.status = ttk.Label(self.window, anchor="w")
+        self.status.pack(side="bottom", fill="x", padx=6)
+        self.scrollbar = ttk.Scrollbar(self.window, orient="vertical", command=self.on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        self.font = tkfont.Font(root=app.root, font=tab.text.cget("font"))
+        self.view = tk.Text(self.window, wrap=tk.NONE, borderwidth=0, highlightthickness=0,
+                            font=self.font, background=tab.text.cget("background"),
+                            foreground=tab.text.cget("foreground"), cursor="arrow")
+        self.view.pack(fill="both", expand=True)
+        self.view.tag_configure("lineno", foreground="#9aa0a6")
+        self.view.tag_configure("current", background="#3e4451")
+        self.view.configure(state="disabled")
+        self.view.bind("<Configure>", lambda e: self.schedule_render())
+        self.view.bind("<Button-1>", self.on_click)
+        self.view.bind("<Return>", lambda e: self.jump())
+        self.view.bind("<Up>", lambda e: self.move(-1))
+        self.view.bind("<Down>", lambda e: self.move(1))
+        self.view.bind("<Prior>", lambda e: self.move(-self.visible_rows()))
+        self.view.bind("<Next>", lambda e: self.move(self.visible_rows()))
+        self.view.bind("<MouseWheel>", lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        self.view.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.view.bind("<Button-5>", lambda e: self.scroll(3))
+
+        self.index = LineIndex(tab, on_change=self.schedule_render, scan_async=self.scan_chunk)
+        tab.filter_views.append(self)
+        self.rescan()
+
+    def scan_chunk(self, numbers, text, done, narrow):
+        stages = [(pat.pattern, pat.flags, hide) for pat, hide in self.stages[self.narrowed if narrow else 0:]]
+        budget = self.app.find_state["timeout"]
+
+        def finished(found, error):
+            self.request = None
+            if error:
+                self.stop(error, budget)
+            else:
+                done(found)
+
+        self.request = RegexSearch(self.worker, self.window, None, text, "lines", (stages, numbers), budget,
+                                   on_done=finished)
+
+    def stop(self, error, budget=None):
+        # Keep what was found so far; edits still update it but nothing is rescanned
+        if self.request:
+            self.request.cancel()
+            return
+        if not self.index.pending and not self.index.narrowing:
+            return
+        self.index.stop()
+        if error == "timeout":
+            self.error = f"Pattern too slow: no result within {budget:g} s; filtering stopped"
+        elif error == "cancelled":
+            self.error = "Stopped"
+        else:
+            self.error = f"Filter failed: {error}"
+        self.schedule_render()
+
+    def update_chain(self):
+        self.chain_label.config(text="  >  ".join(
+            ("not " if hide else "") + pat.pattern for pat, hide in self.stages))
+
+    def rescan(self):
+        self.update_chain()
+        if self.request:
+            self.request.cancel()
+        self.error = None
+        self.narrowed = len(self.stages)
+        self.top = self.current = 0
+        self.index.rebuild()
+        self.schedule_render()
+
+    def add_stage(self):
+        text = self.entry.get()
+        if not text:
+            return
+        pat = self.app._build_pattern(text, self.app.find_state["case"], self.app.find_state["word"], True)
+        if pat is None:
+            return
+        self.stages.append((pat, self.hide_var.get()))
+        self.entry.delete(0, tk.END)
+        if self.index.stopped:
+            # The list is incomplete; start over with the whole chain
+            self.rescan()
+            return
+        self.update_chain()
+        self.index.narrow()
+        self.schedule_render()
+
+    def visible_rows(self):
+        return max(1, self.view.winfo_height() // self.font.metrics("linespace"))
+
+    def schedule_render(self):
+        if self.render_job is None:
+            self.render_job = self.window.after_idle(self.render)
+
+    def render(self):
+        self.render_job = None
+        lines = self.index.lines
+        rows = self.visible_rows()
+        total = len(lines)
+        self.top = max(0, min(self.top, total - rows))
+        self.current = max(0, min(self.current, total - 1))
+        shown = lines[self.top:self.top + rows]
+        width = len(str(lines[-1])) if total else 1
+        text = self.tab.text
+        self.view.configure(state="normal")
+        self.view.delete("1.0", tk.END)
+        for row, n in enumerate(shown):
+            if row:
+                self.view.insert(tk.END, "\n")
+            self.view.insert(tk.END, f"{n:>{width}}  ", "lineno")
+            self.view.insert(tk.END, text.get(f"{n}.0", f"{n}.end"))
+        if total and self.top <= self.current < self.top + rows:
+            row = self.current - self.top + 1
+            self.view.tag_add("current", f"{row}.0", f"{row}.end+1c")
+        self.view.configure(state="disabled")
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + rows) / total))
+        else:
+            self.scrollbar.set(0, 1)
+        if not self.index.narrowing:
+            self.narrowed = len(self.stages)
+        if self.error:
+            state = f" ({self.error})"
+        else:
+            state = " (scanning...)" if self.index.pending or self.index.narrowing else ""
+        self.status.config(text=f"{total} matching lines{state}")
+
+    def scroll(self, rows):
+        self.top += rows
+        self.render()
+        return "break"
+
+    def move(self, rows):
+        # Keyboard selection; the view follows it
+        self.current += rows
+        visible = self.visible_rows()
+        if self.current < self.top:
+            self.top = self.current
+        elif self.current >= self.top + visible:
+            self.top = self.current - visible + 1
+        self.render()
+        return "break"
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.top = int(float(amount) * len(self.index.lines))
+        elif unit == "pages":
+            self.top += int(amount) * self.visible_rows()
+        else:
+            self.top += int(amount)
+        self.render()
+
+    def on_click(self, event):
+        self.current = self.top + int(self.view.index(f"@{event.x},{event.y}").split(".")[0]) - 1
+        self.render()
+        self.jump()
+        # Keep the keyboard in the filter so the arrows go on stepping through matches
+        self.view.focus_set()
+        return "break"
+
+    def jump(self):
+        if self.current < len(self.index.lines):
+            self.app.notebook.select(self.tab.frame)
+            self.tab.goto_line(self.index.lines[self.current])
+        return "break"
+
+    def close(self):
+        if self.render_job is not None:
+            self.window.after_cancel(self.render_job)
+        if self.request:
+            self.request.on_done = None
+            self.request.cancel()
+        self.index.close()
+        self.worker.kill()
+        if self in self.tab.filter_views:
+            self.tab.filter_views.remove(self)
+        self.window.destroy()
+
 class EditorTab:
     def __init__(self, app, notebook, title="Untitled", path=None):
         self.app = app
         self.path = path
         self.title = title
         self.modified = False
+        self.file_format = default_file_format()
+        # Lines of a CRLF or CR file that end in a lone LF, and whether that was warned about on save
+        self.lone_lf = None
+        self.mixed_warned = False
+        self.loader = None
+        self.loading = False
+        self.journal = UndoJournal()
+        self.group_close_pending = False
+        self.edit_count = 0
+        self.disk_mtime = None
+        self.disk_size = 0
+        self.recovery = RecoveryLog(self, app.recovery_writer)
+        self.diff = DiffTracker(self)
+        self.delta_listeners = [self.recovery.on_delta, self.diff.on_delta]
+        self.filter_views = []
+        self.symbols = None
+        self.outline = None
+        self.outline_version = None
+        self.outline_job = None
         self.autosave_enabled = False
         self.autosave_interval_ms = 5000  # 5 seconds
         self.wrap = tk.NONE
@@ -31,61 +1847,251 @@ class EditorTab:
         self.bind_events()
 
     def create_widgets(self):
-        # Outer grid: line numbers + text
-        self.line_numbers = tk.Text(self.frame, width=5, padx=4, takefocus=0,
-                                    state="disabled", background="#2b2b2b", foreground="#9aa0a6",
-                                    borderwidth=0, highlightthickness=0)
-        self.text = tk.Text(self.frame, undo=True, wrap=self.wrap, borderwidth=0, highlightthickness=0)
-        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.on_scrollbar)
-        self.text.configure(yscrollcommand=self.on_textscroll)
+        # Views of the document live in one paned window; the first view owns the text widget
+        self.views = []
+        self.clones = {}
+        self.clone_status = {}
+        self.panes = tk.PanedWindow(self.frame, orient=tk.VERTICAL, sashwidth=4, borderwidth=0)
+        self.active_view = self.add_view(self.panes)
+        self.panes.add(self.active_view.frame)
 
         # Status bar (per tab content region)
         self.status = ttk.Label(self.frame, text="Ln 1, Col 1 | 0 chars", anchor="w")
 
         # Grid layout
-        self.frame.columnconfigure(1, weight=1)
+        self.frame.columnconfigure(0, weight=1)
         self.frame.rowconfigure(0, weight=1)
-        self.line_numbers.grid(row=0, column=0, sticky="nsew")
-        self.text.grid(row=0, column=1, sticky="nsew")
-        self.scrollbar.grid(row=0, column=2, sticky="ns")
-        self.status.grid(row=1, column=0, columnspan=3, sticky="ew")
+        self.panes.grid(row=0, column=0, sticky="nsew")
+        self.status.grid(row=1, column=0, columnspan=2, sticky="ew")
 
         # Fonts and tags for syntax highlighting
         base_font = ("Consolas" if sys.platform.startswith("win") else "Menlo" if sys.platform == "darwin" else "DejaVu Sans Mono", 12)
         self.text.configure(font=base_font)
         self.line_numbers.configure(font=base_font)
 
-        # Syntax highlight tags
+        # Syntax highlight tags (shared by every peer view)
         self.text.tag_configure("py_keyword", foreground="#c678dd")
         self.text.tag_configure("py_string", foreground="#98c379")
         self.text.tag_configure("py_comment", foreground="#5c6370")
         self.text.tag_configure("match_bracket", background="#3e4451")
         self.text.tag_configure("trailing_ws", background="#3a1f1f")
 
-    def bind_events(self):
-        self.text.bind("<<Modified>>", self.on_modified)
-        self.text.bind("<KeyRelease>", self.on_key_release)
-        self.text.bind("<ButtonRelease-1>", lambda e: self.update_status())
-        self.text.bind("<MouseWheel>", lambda e: self.update_line_numbers())  # Windows
-        self.text.bind("<Button-4>", lambda e: self.update_line_numbers())    # Linux scroll up
-        self.text.bind("<Button-5>", lambda e: self.update_line_numbers())    # Linux scroll down
-        self.text.bind("<FocusIn>", lambda e: self.app.update_title())
+    # The text widget and gutter of whichever view has focus
+    @property
+    def text(self):
+        return self.active_view.text
 
-        # Auto-indent
-        self.text.bind("<Return>", self.auto_indent)
-        # Bracket match
-        self.text.bind("<KeyRelease>", self.bracket_match)
+    @property
+    def line_numbers(self):
+        return self.active_view.line_numbers
 
+    def bind_events(self):
         # Autosave ticker
         self.schedule_autosave()
 
-    def on_scrollbar(self, *args):
-        self.text.yview(*args)
-        self.update_line_numbers()
+    def bind_view_events(self, view):
+        text = view.text
+        text.bind("<<Modified>>", self.on_modified)
+        text.bind("<KeyRelease>", self.on_key_release)
+        text.bind("<ButtonRelease-1>", lambda e: self.update_status())
+        text.bind("<MouseWheel>", lambda e: view.update_line_numbers())  # Windows
+        text.bind("<Button-4>", lambda e: view.update_line_numbers())    # Linux scroll up
+        text.bind("<Button-5>", lambda e: view.update_line_numbers())    # Linux scroll down
+        text.bind("<FocusIn>", lambda e: self.on_view_focus(view))
 
-    def on_textscroll(self, *args):
-        self.scrollbar.set(*args)
-        self.update_line_numbers()
+        # Auto-indent
+        text.bind("<Return>", self.auto_indent)
+        # Bracket match
+        text.bind("<KeyRelease>", self.bracket_match)
+
+    # Views
+    def add_view(self, master):
+        source = self.views[0] if self.views else None
+        view = EditorView(self, master, like=source)
+        self.views.append(view)
+        self.bind_view_events(view)
+        return view
+
+    def remove_view(self, view):
+        self.views.remove(view)
+        if self.active_view is view:
+            self.active_view = self.views[0]
+        if str(view.frame) in self.panes.panes():
+            self.panes.forget(view.frame)
+        view.destroy()
+
+    def split(self, orient):
+        # New pane starts at the cursor of the view it was split from
+        self.panes.configure(orient=orient)
+        view = self.add_view(self.panes)
+        self.panes.add(view.frame)
+        view.text.mark_set(tk.INSERT, self.text.index(tk.INSERT))
+        view.text.see(tk.INSERT)
+        view.text.focus_set()
+        return view
+
+    def unsplit(self):
+        for view in [v for v in self.views[1:] if v not in self.clones.values()]:
+            self.remove_view(view)
+
+    def add_clone(self, page):
+        # A cloned page gets its own status bar, showing its own cursor
+        status = ttk.Label(page, anchor="w", background=self.status.cget("background"),
+                           foreground=self.status.cget("foreground"))
+        status.pack(side="bottom", fill="x")
+        view = self.add_view(page)
+        view.frame.pack(fill="both", expand=True)
+        self.clones[page] = view
+        self.clone_status[page] = status
+        self.update_status()
+        return view
+
+    def close_clone(self, page):
+        self.remove_view(self.clones.pop(page))
+        del self.clone_status[page]
+        page.destroy()
+
+    def status_bars(self):
+        """(view, label) for every status bar: the tab's own and one per cloned page."""
+        own = self.views[0] if self.active_view in self.clones.values() else self.active_view
+        return [(own, self.status)] + [(self.clones[page], label) for page, label in self.clone_status.items()]
+
+    def show_page(self, page):
+        # Switching notebook pages switches which view menu commands act on
+        if page in self.clones:
+            self.active_view = self.clones[page]
+        elif self.active_view in self.clones.values():
+            self.active_view = self.views[0]
+
+    def on_view_focus(self, view):
+        self.active_view = view
+        self.app.update_title()
+
+    # Widget proxy: every insert/delete passes through here as a delta
+    def install_proxy(self, widget):
+        name = str(widget)
+        orig = name + "_orig"
+        widget.tk.call("rename", name, orig)
+        widget.tk.createcommand(name + "_py", lambda *args: self.proxy_call(widget, orig, args))
+        # Errors from the real widget must stay Tcl errors: Tk's bindings `catch` them
+        # (e.g. copy with no selection), but one raised through a Python callback
+        # would resurface from mainloop()
+        widget.tk.eval(
+            "proc %s args {\n"
+            "    lassign [%s_py {*}$args] status result\n"
+            "    if {$status eq \"ok\"} {return $result}\n"
+            "    return -code error $result\n"
+            "}" % (name, name))
+
+    def proxy_call(self, widget, orig, args):
+        try:
+            return ("ok", self.dispatch(widget, orig, args))
+        except tk.TclError as e:
+            return ("error", str(e))
+
+    def dispatch(self, widget, orig, args):
+        call = widget.tk.call
+        op = args[0] if args else ""
+        if op == "edit" and len(args) > 1:
+            if args[1] == "undo":
+                return self.undo()
+            if args[1] == "redo":
+                return self.redo()
+            if args[1] == "reset":
+                self.journal.clear()
+            elif args[1] == "separator":
+                self.journal.close_group()
+        if op not in ("insert", "delete", "replace") or self.loading or call(orig, "cget", "-state") == "disabled":
+            return call((orig,) + args)
+        if op == "insert":
+            return self.proxy_insert(call, orig, args[1], args[2:])
+        if op == "delete":
+            return self.proxy_delete(call, orig, args[1], args[2] if len(args) > 2 else None)
+        # replace index1 index2 chars ?tagList chars tagList ...?
+        start = call(orig, "index", args[1])
+        self.proxy_delete(call, orig, start, args[2])
+        return self.proxy_insert(call, orig, start, args[3:])
+
+    def proxy_insert(self, call, orig, index, chunks):
+        text = "".join(chunks[0::2])
+        start = call(orig, "index", index)
+        if call(orig, "compare", start, "==", "end"):
+            # Tk inserts before the final newline
+            start = call(orig, "index", "end-1c")
+        # A right-gravity mark left at start ends up after the inserted text
+        call(orig, "mark", "set", "delta_end", start)
+        result = call((orig, "insert", start) + tuple(chunks))
+        end = call(orig, "index", "delta_end")
+        if text:
+            self.on_delta("insert", start, end, text)
+        return result
+
+    def proxy_delete(self, call, orig, index1, index2=None):
+        start = call(orig, "index", index1)
+        end = call(orig, "index", index2 if index2 is not None else f"{start}+1c")
+        if call(orig, "compare", end, ">", "end-1c"):
+            end = call(orig, "index", "end-1c")
+        if not call(orig, "compare", start, "<", end):
+            return ""
+        text = call(orig, "get", start, end)
+        result = call(orig, "delete", start, end)
+        self.on_delta("delete", start, end, text)
+        return result
+
+    def on_delta(self, op, start, end, text):
+        self.edit_count += 1
+        for listener in self.delta_listeners:
+            listener(op, start, end, text)
+        if self.journal.suspended:
+            return
+        self.journal.record(op, start, end, text)
+        # Everything done in one Tk event undoes as one step
+        if not self.group_close_pending:
+            self.group_close_pending = True
+            self.frame.after_idle(self.close_undo_group)
+
+    def close_undo_group(self):
+        self.group_close_pending = False
+        self.journal.close_group()
+
+    def undo(self):
+        group = self.journal.undo()
+        if group:
+            self.apply_deltas(reversed(group), invert=True)
+        return ""
+
+    def redo(self):
+        group = self.journal.redo()
+        if group:
+            self.apply_deltas(group, invert=False)
+        return ""
+
+    def apply_deltas(self, deltas, invert):
+        self.journal.suspended = True
+        try:
+            for op, start, end, text in deltas:
+                if (op == "insert") != invert:
+                    self.text.insert(start, text)
+                    pos = end
+                else:
+                    self.text.delete(start, end)
+                    pos = start
+        finally:
+            self.journal.suspended = False
+        self.text.mark_set(tk.INSERT, pos)
+        self.text.see(tk.INSERT)
+
+    def replace_content(self, new):
+        # Only the span that actually changed goes through delete/insert (and the journal)
+        old = self.get_content()
+        prefix = common_prefix_length(old, new)
+        suffix = common_suffix_length(old, new, min(len(old), len(new)) - prefix)
+        if prefix == len(old) == len(new):
+            return
+        start = self.text.index(f"1.0 + {prefix} chars")
+        end = self.text.index(f"1.0 + {len(old) - suffix} chars")
+        self.text.delete(start, end)
+        self.text.insert(start, new[prefix:len(new) - suffix])
 
     def load_content(self, content):
         self.text.delete("1.0", tk.END)
@@ -93,14 +2099,119 @@ class EditorTab:
         self.text.edit_reset()
         self.text.edit_modified(False)
         self.modified = False
+        self.recovery.discard()
         self.update_status()
         self.update_line_numbers()
         self.syntax_highlight_all()
 
+    def load_file(self, path, on_done=None):
+        # Stream the file in from a worker thread; the text stays read-only until done
+        self.loading = True
+        self.on_loaded = on_done
+        self.text.delete("1.0", tk.END)
+        self.set_editable(False)
+        self.loader = FileLoader(path)
+        self.loader.start()
+        self.frame.after(LOAD_POLL_MS, self.poll_loader)
+
+    def poll_loader(self):
+        loader = self.loader
+        if loader is None:
+            return
+        deadline = time.monotonic() + LOAD_SLICE_SECONDS
+        while time.monotonic() < deadline:
+            try:
+                chunk = loader.chunks.get_nowait()
+            except queue.Empty:
+                break
+            if chunk is None:
+                self.finish_loading()
+                return
+            try:
+                text = self.views[0].text
+                text.configure(state="normal")
+                text.insert("end-1c", chunk)
+                text.configure(state="disabled")
+            except Exception as e:
+                # Don't leave the tab read-only and the loader blocked on a full queue
+                loader.error = e
+                loader.cancel()
+                self.finish_loading()
+                return
+        self.frame.after(LOAD_POLL_MS, self.poll_loader)
+
+    def finish_loading(self):
+        loader, self.loader = self.loader, None
+        self.loading = False
+        self.set_editable(True)
+        self.file_format = loader.fmt
+        if loader.lone_lf:
+            self.lone_lf = LineIndex(self, lines=loader.lone_lf)
+        self.remember_disk_state()
+        if not loader.error:
+            self.diff.set_base(loader.line_hashes)
+        # Loaded text bypasses the delta proxy
+        self.edit_count += 1
+        for view in self.filter_views:
+            view.rescan()
+        if self.symbols:
+            self.symbols.rebuild()
+        self.text.edit_reset()
+        self.text.edit_modified(False)
+        self.modified = False
+        self.text.mark_set(tk.INSERT, "1.0")
+        self.update_status()
+        self.update_line_numbers()
+        self.syntax_highlight_visible()
+        if self.on_loaded:
+            self.on_loaded(loader.error)
+
+    def set_editable(self, editable):
+        # Read-only state belongs to the document, so it applies to every view of it
+        for view in self.views:
+            view.text.configure(state="normal" if editable else "disabled")
+
+    def cancel_loading(self):
+        if self.loader:
+            self.loader.cancel()
+            self.loader = None
+            self.loading = False
+
+    def remember_disk_state(self):
+        # Recovery logs replay on top of the file only if it hasn't changed since
+        try:
+            st = os.stat(self.path)
+            self.disk_mtime, self.disk_size = st.st_mtime, st.st_size
+        except (OSError, TypeError):
+            self.disk_mtime, self.disk_size = None, 0
+
+    def replay_recovery(self, log_id, records):
+        # Rebuild the edits of a crashed session on top of the restored base
+        self.recovery.paused = True
+        try:
+            for record in records:
+                if record[0] == "i":
+                    self.text.insert(record[1], record[2])
+                else:
+                    self.text.delete(record[1], record[2])
+        finally:
+            self.recovery.paused = False
+        self.text.edit_reset()
+        # Take over under our own log id; the old log goes once the snapshot is written
+        self.recovery.compact()
+        self.recovery.writer.put("discard", log_id)
+        self.modified = True
+        self.app.mark_tab_modified(self)
+        self.update_status()
+        self.syntax_highlight_visible()
+
     def get_content(self):
-        return self.text.get("1.0", tk.END)
+        # Skip the newline Tk always keeps after the last line
+        return self.text.get("1.0", "end-1c")
 
     def on_modified(self, event=None):
+        if self.loading:
+            return
         if self.text.edit_modified():
             self.modified = True
             self.app.mark_tab_modified(self)
@@ -110,25 +2221,76 @@ class EditorTab:
             self.syntax_highlight_visible()
             self.highlight_trailing_whitespace()
 
+    def goto_line(self, line):
+        # Tk resolves "N.0" through its line tree; no scan of the buffer
+        self.text.mark_set(tk.INSERT, f"{line}.0")
+        self.text.see(tk.INSERT)
+        self.text.focus_set()
+        self.update_status()
+
+    # Symbol outline
+    def symbol_index(self):
+        # Built on first use, then kept current from the delta stream
+        if self.symbols is None:
+            self.symbols = LineIndex(self, scan_symbol, self.on_symbols_changed, keep_values=True)
+        return self.symbols
+
+    def on_symbols_changed(self):
+        if self.outline is not None and self.outline.winfo_manager() and self.outline_job is None:
+            self.outline_job = self.frame.after(OUTLINE_REFRESH_MS, self.refresh_outline)
+
+    def toggle_outline(self):
+        if self.outline is None:
+            self.outline = ttk.Treeview(self.frame, show="tree", selectmode="browse")
+            self.outline.bind("<Double-Button-1>", lambda e: self.jump_to_outline())
+            self.outline.bind("<Return>", lambda e: self.jump_to_outline())
+        if self.outline.winfo_manager():
+            self.outline.grid_remove()
+            return False
+        self.outline.grid(row=0, column=1, sticky="ns")
+        self.symbol_index()
+        self.refresh_outline()
+        return True
+
+    def refresh_outline(self):
+        self.outline_job = None
+        index = self.symbols
+        if index.version == self.outline_version:
+            return
+        self.outline_version = index.version
+        self.outline.delete(*self.outline.get_children())
+        # Item ids are positions in the index; they stay valid until its version changes
+        for pos, (depth, parent, qualname) in enumerate(nest_symbols(index.values)):
+            kind, name = index.values[pos][1], index.values[pos][2]
+            label = f"{name}()" if kind == "def" else name
+            self.outline.insert("" if parent is None else str(parent), "end", iid=str(pos),
+                                text=label, open=depth == 0)
+
+    def jump_to_outline(self):
+        selection = self.outline.selection()
+        if not selection:
+            return
+        if self.symbols.version != self.outline_version:
+            self.refresh_outline()
+            return
+        self.goto_line(self.symbols.lines[int(selection[0])])
+
     def update_status(self):
-        index = self.text.index(tk.INSERT)
-        line, col = map(int, index.split("."))
         content = self.get_content()
         length = len(content.rstrip("\n"))
-        self.status.config(text=f"Ln {line}, Col {col+1} | {length} chars")
+        encoding = self.file_format["encoding"].upper() + (" BOM" if self.file_format["bom"] else "")
+        newline = NEWLINE_NAMES[self.file_format["newline"]]
+        if self.file_format["mixed"]:
+            newline = f"Mixed ({newline})"
+        if self.file_format["compression"]:
+            newline += " | " + self.file_format["compression"].upper()
+        for view, label in self.status_bars():
+            line, col = map(int, view.text.index(tk.INSERT).split("."))
+            label.config(text=f"Ln {line}, Col {col+1} | {length} chars | {encoding} | {newline}")
 
     def update_line_numbers(self):
-        # Display current visible line numbers
-        self.line_numbers.config(state="normal")
-        self.line_numbers.delete("1.0", tk.END)
-        start = self.text.index("@0,0")
-        end = self.text.index("@0,%d" % self.text.winfo_height())
-        start_line = int(start.split(".")[0])
-        end_line = int(end.split(".")[0]) + 1
-
-        lines = "\n".join(str(i) for i in range(start_line, end_line))
-        self.line_numbers.insert("1.0", lines)
-        self.line_numbers.config(state="disabled")
+        for view in self.views:
+            view.update_line_numbers()
 
     def on_key_release(self, event=None):
         self.update_status()
@@ -193,17 +2355,16 @@ class EditorTab:
         self.apply_python_highlight(text, "1.0")
 
     def syntax_highlight_visible(self):
+        # Tags are shared between peers, so highlight what any view shows
         self.text.tag_remove("py_keyword", "1.0", tk.END)
         self.text.tag_remove("py_string", "1.0", tk.END)
         self.text.tag_remove("py_comment", "1.0", tk.END)
-        start = self.text.index("@0,0")
-        end = self.text.index("@0,%d" % self.text.winfo_height())
-        sline = int(start.split(".")[0])
-        eline = int(end.split(".")[0]) + 1
-        region_start = f"{sline}.0"
-        region_end = f"{eline}.0"
-        segment = self.text.get(region_start, region_end)
-        self.apply_python_highlight(segment, region_start)
+        for view in self.views:
+            sline, eline = view.visible_lines()
+            region_start = f"{sline}.0"
+            region_end = f"{eline}.0"
+            segment = self.text.get(region_start, region_end)
+            self.apply_python_highlight(segment, region_start)
 
     def apply_python_highlight(self, segment, start_index):
         # Strings (single, double, triple)
@@ -236,7 +2397,8 @@ class EditorTab:
 
     def toggle_wrap(self):
         self.wrap = tk.WORD if self.wrap == tk.NONE else tk.NONE
-        self.text.configure(wrap=self.wrap)
+        for view in self.views:
+            view.text.configure(wrap=self.wrap)
         return self.wrap
 
     def toggle_autosave(self):
@@ -256,12 +2418,16 @@ class NotepadApp:
         self.root.title(APP_NAME)
         self.theme_dark = False
         self.recent_files = []
+        self.recovery_writer = RecoveryWriter()
+        self.recovery_writer.start()
 
         self.create_ui()
         self.apply_theme()
 
         # New initial tab
-        self.new_tab()
+        self.register_tab(self.new_tab())
+        # Rebuild tabs left unsaved by a crash once the tab registry is in place
+        self.root.after_idle(self.recover_tabs)
 
     def create_ui(self):
         # Menu
@@ -308,15 +2474,28 @@ class NotepadApp:
         self.search_menu.add_command(label="Find/Replace...", command=self.open_find_dialog, accelerator="Ctrl+F")
         self.search_menu.add_command(label="Find Next", command=lambda: self.find_next(), accelerator="F3")
         self.search_menu.add_command(label="Find Previous", command=lambda: self.find_prev(), accelerator="Shift+F3")
+        self.search_menu.add_separator()
+        self.search_menu.add_command(label="Filter Lines...", command=self.filter_lines, accelerator="Ctrl+L")
+        self.search_menu.add_separator()
+        self.search_menu.add_command(label="Go To Line...", command=self.go_to_line, accelerator="Ctrl+G")
+        self.search_menu.add_command(label="Go To Symbol...", command=self.go_to_symbol, accelerator="Ctrl+R")
 
         # View menu
         self.view_menu.add_command(label="Toggle Line Numbers", command=self.toggle_line_numbers)
         self.view_menu.add_command(label="Toggle Word Wrap", command=self.toggle_word_wrap)
         self.view_menu.add_command(label="Toggle Dark Mode", command=self.toggle_theme)
+        self.view_menu.add_command(label="Toggle Outline", command=self.toggle_outline, accelerator="Ctrl+Shift+O")
+        self.view_menu.add_separator()
+        self.view_menu.add_command(label="Split Horizontally", command=lambda: self.split_view(tk.VERTICAL))
+        self.view_menu.add_command(label="Split Vertically", command=lambda: self.split_view(tk.HORIZONTAL))
+        self.view_menu.add_command(label="Unsplit", command=self.unsplit_view)
+        self.view_menu.add_command(label="Clone Tab", command=self.clone_tab)
         self.view_menu.add_separator()
         self.view_menu.add_command(label="Zoom In", command=lambda: self.zoom(1), accelerator="Ctrl++")
         self.view_menu.add_command(label="Zoom Out", command=lambda: self.zoom(-1), accelerator="Ctrl+-")
         self.view_menu.add_command(label="Reset Zoom", command=lambda: self.zoom(0), accelerator="Ctrl+0")
+        self.view_menu.add_separator()
+        self.view_menu.add_command(label="Compare with Saved...", command=self.compare_with_saved)
 
         # Tools menu
         self.tools_menu.add_command(label="Toggle Autosave (Current Tab)", command=self.toggle_autosave_current)
@@ -328,7 +2507,7 @@ class NotepadApp:
         # Notebook
         self.notebook = ttk.Notebook(self.root)
         self.notebook.pack(fill="both", expand=True)
-        self.notebook.bind("<<NotebookTabChanged>>", lambda e: self.update_title())
+        self.notebook.bind("<<NotebookTabChanged>>", lambda e: self.on_page_changed())
 
         # Key bindings (global)
         self.root.bind("<Control-n>", lambda e: self.new_tab())
@@ -339,13 +2518,22 @@ class NotepadApp:
         self.root.bind("<Control-f>", lambda e: self.open_find_dialog())
         self.root.bind("<F3>", lambda e: self.find_next())
         self.root.bind("<Shift-F3>", lambda e: self.find_prev())
+        self.root.bind("<Control-l>", lambda e: self.filter_lines())
+        self.root.bind("<Control-g>", lambda e: self.go_to_line())
+        self.root.bind("<Control-r>", lambda e: self.go_to_symbol())
+        self.root.bind("<Control-Shift-O>", lambda e: self.toggle_outline())
         self.root.bind("<Control-Key-plus>", lambda e: self.zoom(1))
         self.root.bind("<Control-Key-minus>", lambda e: self.zoom(-1))
         self.root.bind("<Control-Key-0>", lambda e: self.zoom(0))
         self.root.protocol("WM_DELETE_WINDOW", self.on_exit)
 
         self.find_dialog = None
-        self.find_state = {"pattern": "", "case": False, "word": False, "regex": False}
+        self.find_state = {"pattern": "", "case": False, "word": False, "regex": False, "timeout": SEARCH_TIME_BUDGET}
+        self.search = None
+        self.last_match = None
+        self.search_worker = SearchWorker()
+        # Boot the search process while the user is still reading the window
+        self.root.after_idle(self.search_worker.ensure)
 
     # Tabs
     def new_tab(self, title="Untitled", path=None, content=""):
@@ -364,10 +2552,16 @@ class NotepadApp:
             if str(child) == curr:
                 # Find matching EditorTab by frame
                 for tab in self.all_tabs():
-                    if tab.frame == child:
+                    if tab.frame == child or child in tab.clones:
                         return tab
         return None
 
+    def on_page_changed(self):
+        tab = self.current_tab()
+        if tab:
+            tab.show_page(self.notebook.nametowidget(self.notebook.select()))
+        self.update_title()
+
     def all_tabs(self):
         tabs = []
         for child in self.notebook.winfo_children():
@@ -389,39 +2583,55 @@ class NotepadApp:
     def register_tab(self, tab):
         if not hasattr(self, "_tabs"):
             self._tabs = []
+        if tab in self._tabs:
+            return
         self._tabs.append(tab)
         # Attach back-reference to frame (optional)
         tab.frame._tab_obj = tab
 
     def mark_tab_modified(self, tab):
-        idx = self.notebook.index(tab.frame)
-        label = tab.title
-        if tab.modified and not label.endswith("*"):
-            label += " *"
-        elif not tab.modified:
-            label = tab.title
-        self.notebook.tab(idx, text=label)
+        self.update_tab_labels(tab)
         self.update_title()
 
+    def update_tab_labels(self, tab):
+        # Cloned pages carry the document's title and modified mark too
+        mark = " *" if tab.modified else ""
+        self.notebook.tab(tab.frame, text=tab.title + mark)
+        for page in tab.clones:
+            self.notebook.tab(page, text=f"{tab.title} (view){mark}")
+
     def open_file(self):
         path = filedialog.askopenfilename(filetypes=[("All Files", "*.*"), ("Text Files", "*.txt"), ("Python Files", "*.py")])
         if not path:
             return
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                content = f.read()
-        except Exception as e:
-            messagebox.showerror(APP_NAME, f"Could not open file:\n{e}")
-            return
+        self.open_path(path)
+
+    def open_path(self, path):
+        # Decoding (and decompression) happens in the background; the tab fills in as chunks arrive
         title = os.path.basename(path)
-        tab = self.new_tab(title=title, path=path, content=content)
+        tab = self.new_tab(title=title, path=path)
         self.register_tab(tab)
-        self.add_recent(path)
+        tab.load_file(path, on_done=lambda error: self.on_tab_loaded(tab, error))
+        return tab
+
+    def on_tab_loaded(self, tab, error):
+        if error:
+            messagebox.showerror(APP_NAME, f"Could not open file:\n{error}")
+            self.notebook.forget(tab.frame)
+            self._tabs.remove(tab)
+            self.update_title()
+            return
+        self.add_recent(tab.path)
 
     def save_file(self, tab=None, save_as=False, silent=False):
         tab = tab or self.current_tab()
         if not tab:
             return
+        if tab.loading:
+            # Saving a partially loaded buffer would truncate the file
+            if not silent:
+                self.status_message("Still loading, try again when the file is open.")
+            return
         path = tab.path
         if save_as or not path:
             path = filedialog.asksaveasfilename(defaultextension=".txt",
@@ -430,18 +2640,34 @@ class NotepadApp:
                 return
             tab.path = path
             tab.title = os.path.basename(path)
-            self.notebook.tab(tab.frame, text=tab.title)
+            # Save As picks the compressor from the new extension
+            compression = COMPRESSION_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+            if compression != tab.file_format["compression"]:
+                tab.file_format = dict(tab.file_format, compression=compression,
+                                       level=DEFAULT_COMPRESSION_LEVEL.get(compression))
+            self.update_tab_labels(tab)
             self.update_title()
         content = tab.get_content()
+        mixed_warning = not silent and mixed_newline_warning(tab.file_format)
         try:
-            with open(path, "w", encoding="utf-8") as f:
-                f.write(content)
+            fmt = write_text_file(path, content, tab.file_format, tab.lone_lf.lines if tab.lone_lf else ())
         except Exception as e:
             if not silent:
                 messagebox.showerror(APP_NAME, f"Could not save file:\n{e}")
             return
+        tab.remember_disk_state()
+        tab.recovery.discard()
+        tab.diff.set_base()
         tab.modified = False
         self.mark_tab_modified(tab)
+        if fmt["encoding"] != tab.file_format["encoding"]:
+            tab.file_format = fmt
+            tab.update_status()
+            if not silent:
+                messagebox.showwarning(APP_NAME, "Some characters could not be encoded in the original encoding.\nThe file was saved as UTF-8.")
+        if mixed_warning and not tab.mixed_warned:
+            tab.mixed_warned = True
+            messagebox.showwarning(APP_NAME, mixed_warning)
         if not silent:
             self.status_message(f"Saved: {path}")
         # Highlight entire after save
@@ -458,12 +2684,28 @@ class NotepadApp:
         tab = self.current_tab()
         if not tab:
             return
+        page = self.notebook.nametowidget(self.notebook.select())
+        if page in tab.clones:
+            # A cloned view only goes away; the document stays open in its own tab
+            self.notebook.forget(page)
+            tab.close_clone(page)
+            self.update_title()
+            return
         if tab.modified:
             ans = messagebox.askyesnocancel(APP_NAME, "Save changes before closing?")
             if ans is None:
                 return
             if ans:
                 self.save_file(tab=tab)
+        tab.cancel_loading()
+        tab.recovery.discard()
+        for view in list(tab.filter_views):
+            view.close()
+        if tab.symbols:
+            tab.symbols.close()
+        for page in list(tab.clones):
+            self.notebook.forget(page)
+            tab.close_clone(page)
         self.notebook.forget(tab.frame)
         self._tabs.remove(tab)
         self.update_title()
@@ -478,8 +2720,55 @@ class NotepadApp:
                     return
                 if ans:
                     self.save_file(tab=tab)
+        for tab in self._tabs:
+            tab.recovery.discard()
+        self.recovery_writer.stop()
+        self.search_worker.kill()
         self.root.destroy()
 
+    def recover_tabs(self):
+        recovered, stale = 0, []
+        for log_id, header, records, snapshot in load_recovery_logs(self.recovery_writer.directory):
+            path = header["path"]
+            if path and header["mtime"] is not None:
+                try:
+                    unchanged = os.path.getmtime(path) == header["mtime"]
+                except OSError:
+                    unchanged = False
+                if not unchanged and header["base"] == "file":
+                    # Replaying onto a file that changed since would corrupt it
+                    stale.append((log_id, path))
+                    continue
+                if not unchanged:
+                    # The snapshot holds the whole text, but saving it over the newer file would lose that
+                    path = None
+            tab = self.new_tab(title=header["title"] if path else "Untitled", path=path)
+            self.register_tab(tab)
+            tab.file_format = format_from_json(header["format"])
+            if header["base"] == "file":
+                tab.load_file(path, on_done=lambda error, tab=tab, log=(log_id, records):
+                              self.on_recovery_loaded(tab, error, *log))
+            else:
+                tab.load_content(snapshot or "")
+                tab.replay_recovery(log_id, records)
+            recovered += 1
+        if recovered:
+            self.status_message(f"Recovered {recovered} unsaved tab(s).")
+        if stale:
+            paths = "\n".join(path for _, path in stale[:10]) + ("\n..." if len(stale) > 10 else "")
+            if messagebox.askyesno(APP_NAME, f"Unsaved edits to {len(stale)} file(s) can't be recovered because "
+                                             f"the file changed on disk since:\n{paths}\n\nDiscard these edits?\n"
+                                             f"(No keeps them in {self.recovery_writer.directory} and asks again next time.)"):
+                for log_id, _ in stale:
+                    self.recovery_writer.put("discard", log_id)
+
+    def on_recovery_loaded(self, tab, error, log_id, records):
+        if error:
+            # The log stays on disk for the next attempt
+            self.on_tab_loaded(tab, error)
+            return
+        tab.replay_recovery(log_id, records)
+
     def add_recent(self, path):
         if path in self.recent_files:
             self.recent_files.remove(path)
@@ -503,15 +2792,7 @@ class NotepadApp:
             self.recent_files = [p for p in self.recent_files if p != path]
             self.refresh_recent_menu()
             return
-        try:
-            with open(path, "r", encoding="utf-8") as f:
-                content = f.read()
-        except Exception as e:
-            messagebox.showerror(APP_NAME, f"Could not open file:\n{e}")
-            return
-        title = os.path.basename(path)
-        tab = self.new_tab(title=title, path=path, content=content)
-        self.register_tab(tab)
+        self.open_path(path)
 
     def clear_recents(self):
         self.recent_files = []
@@ -553,6 +2834,7 @@ class NotepadApp:
         self.find_dialog.title("Find/Replace")
         self.find_dialog.resizable(False, False)
         self.find_dialog.transient(self.root)
+        self.find_dialog.protocol("WM_DELETE_WINDOW", self.close_find_dialog)
 
         ttk.Label(self.find_dialog, text="Find:").grid(row=0, column=0, sticky="e", padx=6, pady=6)
         find_entry = ttk.Entry(self.find_dialog, width=32)
@@ -565,25 +2847,51 @@ class NotepadApp:
         case_var = tk.BooleanVar(value=self.find_state["case"])
         word_var = tk.BooleanVar(value=self.find_state["word"])
         regex_var = tk.BooleanVar(value=self.find_state["regex"])
+        timeout_var = tk.StringVar(value=f"{self.find_state['timeout']:g}")
 
         ttk.Checkbutton(self.find_dialog, text="Match case", variable=case_var).grid(row=2, column=0, sticky="w", padx=6)
         ttk.Checkbutton(self.find_dialog, text="Whole word", variable=word_var).grid(row=2, column=1, sticky="w", padx=6)
         ttk.Checkbutton(self.find_dialog, text="Regex", variable=regex_var).grid(row=2, column=2, sticky="w", padx=6)
 
-        btn_find_next = ttk.Button(self.find_dialog, text="Find Next", command=lambda: self.find_next(find_entry.get(), case_var.get(), word_var.get(), regex_var.get()))
-        btn_find_prev = ttk.Button(self.find_dialog, text="Find Prev", command=lambda: self.find_prev(find_entry.get(), case_var.get(), word_var.get(), regex_var.get()))
-        btn_replace = ttk.Button(self.find_dialog, text="Replace", command=lambda: self.replace_one(find_entry.get(), replace_entry.get(), case_var.get(), word_var.get(), regex_var.get()))
-        btn_replace_all = ttk.Button(self.find_dialog, text="Replace All", command=lambda: self.replace_all(find_entry.get(), replace_entry.get(), case_var.get(), word_var.get(), regex_var.get()))
-        btn_close = ttk.Button(self.find_dialog, text="Close", command=self.find_dialog.destroy)
-
-        btn_find_next.grid(row=3, column=0, padx=6, pady=10)
-        btn_find_prev.grid(row=3, column=1, padx=6, pady=10)
-        btn_replace.grid(row=3, column=2, padx=6, pady=10)
-        btn_replace_all.grid(row=3, column=3, padx=6, pady=10)
-        btn_close.grid(row=4, column=3, sticky="e", padx=6, pady=6)
+        ttk.Label(self.find_dialog, text="Time limit (s):").grid(row=3, column=0, sticky="e", padx=6)
+        ttk.Spinbox(self.find_dialog, from_=1, to=300, width=6, textvariable=timeout_var).grid(row=3, column=1, sticky="w", padx=6)
+
+        def budget():
+            try:
+                self.find_state["timeout"] = max(0.1, float(timeout_var.get()))
+            except ValueError:
+                timeout_var.set(f"{self.find_state['timeout']:g}")
+
+        def run(action):
+            budget()
+            action()
+
+        btn_find_next = ttk.Button(self.find_dialog, text="Find Next", command=lambda: run(lambda: self.find_next(find_entry.get(), case_var.get(), word_var.get(), regex_var.get())))
+        btn_find_prev = ttk.Button(self.find_dialog, text="Find Prev", command=lambda: run(lambda: self.find_prev(find_entry.get(), case_var.get(), word_var.get(), regex_var.get())))
+        btn_replace = ttk.Button(self.find_dialog, text="Replace", command=lambda: run(lambda: self.replace_one(find_entry.get(), replace_entry.get(), case_var.get(), word_var.get(), regex_var.get())))
+        btn_replace_all = ttk.Button(self.find_dialog, text="Replace All", command=lambda: run(lambda: self.replace_all(find_entry.get(), replace_entry.get(), case_var.get(), word_var.get(), regex_var.get())))
+        btn_cancel = ttk.Button(self.find_dialog, text="Cancel", command=self.cancel_search)
+        btn_close = ttk.Button(self.find_dialog, text="Close", command=self.close_find_dialog)
+
+        btn_find_next.grid(row=4, column=0, padx=6, pady=10)
+        btn_find_prev.grid(row=4, column=1, padx=6, pady=10)
+        btn_replace.grid(row=4, column=2, padx=6, pady=10)
+        btn_replace_all.grid(row=4, column=3, padx=6, pady=10)
+        self.find_status = ttk.Label(self.find_dialog, text="", anchor="w")
+        self.find_status.grid(row=5, column=0, columnspan=2, sticky="we", padx=6, pady=6)
+        btn_cancel.grid(row=5, column=2, sticky="e", padx=6, pady=6)
+        btn_close.grid(row=5, column=3, sticky="e", padx=6, pady=6)
 
         find_entry.focus_set()
 
+    def close_find_dialog(self):
+        self.cancel_search()
+        self.find_dialog.destroy()
+
+    def set_find_status(self, msg):
+        if self.find_dialog and tk.Toplevel.winfo_exists(self.find_dialog):
+            self.find_status.config(text=msg)
+
     def _build_pattern(self, text, case, word, regex):
         flags = 0 if case else re.IGNORECASE
         if not regex:
@@ -597,7 +2905,48 @@ class NotepadApp:
             messagebox.showerror(APP_NAME, f"Invalid regex:\n{e}")
             return None
 
-    def find_next(self, pattern=None, case=None, word=None, regex=None):
+    def start_search(self, tab, pat, content, mode, pos=0, replacement="", on_found=None):
+        # Matching runs in a child process so a runaway pattern can't freeze the editor
+        self.cancel_search()
+        edit_count = tab.edit_count
+        budget = self.find_state["timeout"]
+        # The worker keeps the last snapshot; only send the buffer when it changed
+        key = (tab.recovery.id, edit_count)
+        if content is None and not self.search_worker.has_snapshot(key):
+            content = tab.get_content()
+
+        def done(matches, error):
+            self.search = None
+            self.set_find_status("")
+            changed = tab.edit_count != edit_count
+            if error in ("cancelled", "timeout") and matches and mode == "all" and not changed:
+                # Matches arrive in document order, so the partial list is a clean prefix
+                reason = "Search cancelled" if error == "cancelled" else f"Pattern too slow: stopped after {budget:g} s"
+                if messagebox.askyesno(APP_NAME, f"{reason}.\n{len(matches)} matches were found before it stopped.\n"
+                                                 "Replace those?"):
+                    on_found(matches)
+            elif error == "cancelled":
+                self.status_message("Search cancelled.")
+            elif error == "timeout":
+                messagebox.showerror(APP_NAME, f"Pattern too slow: no result within {budget:g} s.\nThe search was stopped.")
+            elif error:
+                messagebox.showerror(APP_NAME, f"Search failed:\n{error}")
+            elif changed:
+                self.status_message("Text changed during search; search again.")
+            else:
+                on_found(matches)
+
+        self.set_find_status("Searching...")
+        self.search = RegexSearch(self.search_worker, self.root, key, content, mode,
+                                  (pat.pattern, pat.flags, pos, replacement), budget,
+                                  on_progress=lambda n: self.set_find_status(f"Searching... {n} matches"),
+                                  on_done=done)
+
+    def cancel_search(self):
+        if self.search:
+            self.search.cancel()
+
+    def find_next(self, pattern=None, case=None, word=None, regex=None, then=None):
         tab = self.current_tab()
         if not tab:
             return
@@ -616,21 +2965,9 @@ class NotepadApp:
             return
 
         start = tab.text.index(tk.INSERT)
-        content = tab.text.get("1.0", tk.END)
         offset = self.index_to_offset(tab.text, start)
-        m = pat.search(content, pos=offset+1)
-        if not m:
-            m = pat.search(content, pos=0)
-            if not m:
-                self.status_message("Not found.")
-                return
-        s = self.offset_to_index(tab.text, m.start())
-        e = self.offset_to_index(tab.text, m.end())
-        tab.text.tag_remove(tk.SEL, "1.0", tk.END)
-        tab.text.tag_add(tk.SEL, s, e)
-        tab.text.mark_set(tk.INSERT, e)
-        tab.text.see(s)
-        self.status_message("Match found.")
+        self.start_search(tab, pat, None, "next", offset + 1,
+                          on_found=lambda matches: self.select_match(tab, matches, at_end=True, then=then))
 
     def find_prev(self, pattern=None, case=None, word=None, regex=None):
         tab = self.current_tab()
@@ -650,23 +2987,28 @@ class NotepadApp:
         if not pat:
             return
 
-        content = tab.text.get("1.0", tk.END)
         insert = tab.text.index(tk.INSERT)
         offset = self.index_to_offset(tab.text, insert)
-        matches = list(pat.finditer(content[:max(0, offset)]))
+        self.start_search(tab, pat, None, "prev", max(0, offset),
+                          on_found=lambda matches: self.select_match(tab, matches, at_end=False))
+
+    def select_match(self, tab, matches, at_end, then=None):
         if not matches:
-            matches = list(pat.finditer(content))
-            if not matches:
-                self.status_message("Not found.")
-                return
-        m = matches[-1]
-        s = self.offset_to_index(tab.text, m.start())
-        e = self.offset_to_index(tab.text, m.end())
+            self.status_message("Not found.")
+            return
+        m_start, m_end = matches[-1][:2]
+        s = self.offset_to_index(tab.text, m_start)
+        e = self.offset_to_index(tab.text, m_end)
         tab.text.tag_remove(tk.SEL, "1.0", tk.END)
         tab.text.tag_add(tk.SEL, s, e)
-        tab.text.mark_set(tk.INSERT, s)
+        tab.text.mark_set(tk.INSERT, e if at_end else s)
         tab.text.see(s)
+        # Replace trusts a selection only if it is still exactly this match
+        state = self.find_state
+        self.last_match = (tab, tab.edit_count, s, e, (state["pattern"], state["case"], state["word"], state["regex"]))
         self.status_message("Match found.")
+        if then:
+            then()
 
     def replace_one(self, pattern, replacement, case, word, regex):
         tab = self.current_tab()
@@ -676,28 +3018,27 @@ class NotepadApp:
             return
         sel = tab.text.tag_ranges(tk.SEL)
         if sel:
-            s, e = sel
-            current = tab.text.get(s, e)
-            pat = self._build_pattern(pattern, case, word, regex)
-            if not pat:
-                return
-            if pat.fullmatch(current):
+            s, e = map(str, sel)
+            # No regex on the Tk thread: the selection must be the match find just returned
+            if self.last_match == (tab, tab.edit_count, s, e, (pattern, case, word, regex)):
                 tab.text.delete(s, e)
                 tab.text.insert(s, replacement)
                 tab.text.tag_remove(tk.SEL, "1.0", tk.END)
                 tab.text.mark_set(tk.INSERT, s)
                 self.status_message("Replaced selection.")
                 return
-        # If no selection or not matching, find next and replace
-        self.find_next(pattern, case, word, regex)
-        sel = tab.text.tag_ranges(tk.SEL)
-        if sel:
-            s, e = sel
-            tab.text.delete(s, e)
-            tab.text.insert(s, replacement)
-            tab.text.tag_remove(tk.SEL, "1.0", tk.END)
-            tab.text.mark_set(tk.INSERT, s)
-            self.status_message("Replaced match.")
+
+        # If no selection or not matching, find next and replace once it's selected
+        def replace_found():
+            sel = tab.text.tag_ranges(tk.SEL)
+            if sel:
+                s, e = sel
+                tab.text.delete(s, e)
+                tab.text.insert(s, replacement)
+                tab.text.tag_remove(tk.SEL, "1.0", tk.END)
+                tab.text.mark_set(tk.INSERT, s)
+                self.status_message("Replaced match.")
+        self.find_next(pattern, case, word, regex, then=replace_found)
 
     def replace_all(self, pattern, replacement, case, word, regex):
         tab = self.current_tab()
@@ -706,43 +3047,250 @@ class NotepadApp:
         pat = self._build_pattern(pattern, case, word, regex)
         if not pat:
             return
-        content = tab.text.get("1.0", tk.END)
-        new = pat.sub(replacement, content)
-        tab.text.delete("1.0", tk.END)
-        tab.text.insert("1.0", new)
-        self.status_message("Replace all done.")
+        content = tab.get_content()
+
+        def apply(matches):
+            # Rebuild from the snapshot; replace_content only touches the changed span
+            parts, last = [], 0
+            for m_start, m_end, expansion in matches:
+                parts.append(content[last:m_start])
+                parts.append(expansion)
+                last = m_end
+            parts.append(content[last:])
+            tab.replace_content("".join(parts))
+            self.status_message(f"Replace all done: {len(matches)} replaced.")
+        self.start_search(tab, pat, content, "all", replacement=replacement, on_found=apply)
 
     # Helpers to convert between text index and offset
     def index_to_offset(self, text_widget, index):
-        # index like "line.column"
-        line, col = map(int, str(index).split("."))
-        offset = 0
-        for i in range(1, line):
-            offset += len(text_widget.get(f"{i}.0", f"{i}.end")) + 1  # include newline
-        offset += col
-        return offset
+        # Tk counts through its B-tree, no need to walk lines from Python
+        return int(text_widget.tk.call(str(text_widget), "count", "-chars", "1.0", index) or 0)
 
     def offset_to_index(self, text_widget, offset):
-        # Walk lines until offset fits
-        line = 1
-        while True:
-            line_len = len(text_widget.get(f"{line}.0", f"{line}.end")) + 1
-            if offset < line_len:
-                return f"{line}.{offset}"
-            offset -= line_len
-            line += 1
+        return text_widget.index(f"1.0 + {offset} chars")
 
     # View and tools
     def toggle_line_numbers(self):
         tab = self.current_tab()
         if not tab:
             return
-        if tab.line_numbers.winfo_viewable():
-            tab.line_numbers.grid_remove()
-        else:
-            tab.line_numbers.grid()
+        show = not tab.line_numbers.winfo_viewable()
+        for view in tab.views:
+            if show:
+                view.line_numbers.grid()
+            else:
+                view.line_numbers.grid_remove()
+        if show:
             tab.update_line_numbers()
 
+    # Split and cloned views share the tab's document through Tk peer widgets
+    def split_view(self, orient):
+        tab = self.current_tab()
+        if not tab:
+            return
+        if tab.loading:
+            self.status_message("Still loading, try again when the file is open.")
+            return
+        tab.split(orient)
+        tab.syntax_highlight_visible()
+
+    def unsplit_view(self):
+        tab = self.current_tab()
+        if tab:
+            tab.unsplit()
+
+    def clone_tab(self):
+        tab = self.current_tab()
+        if not tab:
+            return
+        if tab.loading:
+            self.status_message("Still loading, try again when the file is open.")
+            return
+        page = ttk.Frame(self.notebook)
+        view = tab.add_clone(page)
+        self.notebook.add(page)
+        self.update_tab_labels(tab)
+        self.notebook.select(page)
+        view.text.mark_set(tk.INSERT, tab.views[0].text.index(tk.INSERT))
+        view.text.see(tk.INSERT)
+
+    def filter_lines(self):
+        tab = self.current_tab()
+        if not tab or tab.loading:
+            return
+        text = simpledialog.askstring(APP_NAME, "Show lines matching (regex):",
+                                      initialvalue=self.find_state["pattern"], parent=self.root)
+        if not text:
+            return
+        pat = self._build_pattern(text, self.find_state["case"], self.find_state["word"], True)
+        if pat is not None:
+            FilterView(self, tab, [(pat, False)])
+
+    def go_to_line(self):
+        tab = self.current_tab()
+        if not tab:
+            return
+        last = int(tab.text.index("end-1c").split(".")[0])
+        current = int(tab.text.index(tk.INSERT).split(".")[0])
+        line = simpledialog.askinteger(APP_NAME, f"Line number (1-{last}):", initialvalue=current,
+                                       minvalue=1, maxvalue=last, parent=self.root)
+        if line:
+            tab.goto_line(line)
+
+    def go_to_symbol(self):
+        tab = self.current_tab()
+        if not tab or tab.loading:
+            return
+        index = tab.symbol_index()
+        win = tk.Toplevel(self.root)
+        win.title(f"Go To Symbol: {tab.title}")
+        win.geometry("480x360")
+        win.transient(self.root)
+        entry = ttk.Entry(win)
+        entry.pack(fill="x", padx=6, pady=6)
+        listbox = tk.Listbox(win, activestyle="none")
+        listbox.pack(fill="both", expand=True, padx=6, pady=(0, 6))
+        shown = []  # index positions of the listed symbols
+        state = {"version": None, "names": []}
+
+        def refresh():
+            if not win.winfo_exists():
+                return
+            if state["version"] != index.version:
+                state["version"] = index.version
+                state["names"] = [qualname for _, _, qualname in nest_symbols(index.values)]
+            query = entry.get().strip()
+            if query:
+                scored = ((fuzzy_score(query, name), pos) for pos, name in enumerate(state["names"]))
+                ranked = sorted((score, pos) for score, pos in scored if score is not None)
+                positions = [pos for _, pos in ranked[:SYMBOL_PROMPT_ROWS]]
+            else:
+                positions = list(range(min(len(state["names"]), SYMBOL_PROMPT_ROWS)))
+            shown[:] = positions
+            listbox.delete(0, tk.END)
+            for pos in positions:
+                listbox.insert(tk.END, f"{state['names'][pos]}    :{index.lines[pos]}")
+            if positions:
+                listbox.selection_set(0)
+            if index.pending and state.get("job") is None:
+                # Still indexing; pick up the rest as it arrives
+                state["job"] = win.after(100, rescan)
+
+        def rescan():
+            state["job"] = None
+            refresh()
+
+        def move(step):
+            if shown:
+                current = listbox.curselection()
+                row = max(0, min(len(shown) - 1, (current[0] if current else -1) + step))
+                listbox.selection_clear(0, tk.END)
+                listbox.selection_set(row)
+                listbox.see(row)
+            return "break"
+
+        def accept(event=None):
+            current = listbox.curselection()
+            if state["version"] != index.version:
+                refresh()
+            elif current:
+                line = index.lines[shown[current[0]]]
+                win.destroy()
+                tab.goto_line(line)
+            return "break"
+
+        entry.bind("<KeyRelease>", lambda e: refresh() if e.keysym not in ("Up", "Down", "Return") else None)
+        entry.bind("<Up>", lambda e: move(-1))
+        entry.bind("<Down>", lambda e: move(1))
+        entry.bind("<Return>", accept)
+        listbox.bind("<Double-Button-1>", accept)
+        win.bind("<Escape>", lambda e: win.destroy())
+        entry.focus_set()
+        refresh()
+
+    def toggle_outline(self):
+        tab = self.current_tab()
+        if tab:
+            tab.toggle_outline()
+
+    def compare_with_saved(self):
+        tab = self.current_tab()
+        if not tab:
+            return
+        if not tab.path or not os.path.exists(tab.path):
+            messagebox.showinfo(APP_NAME, "This tab has no saved file to compare with.")
+            return
+        path, snapshot = tab.path, tab.get_content()
+        result = {}
+
+        def work():
+            # Reading, decoding and diffing all stay off the UI thread
+            try:
+                old_lines, new_lines = read_text_file(path)[0].split("\n"), snapshot.split("\n")
+                opcodes = diff_lines([hash(l) for l in old_lines], [hash(l) for l in new_lines])
+                result["diff"] = list(group_opcodes(opcodes)), old_lines, new_lines
+            except Exception as e:
+                result["error"] = e
+
+        def poll():
+            if worker.is_alive():
+                self.root.after(DIFF_POLL_MS, poll)
+            elif "error" in result:
+                messagebox.showerror(APP_NAME, f"Could not compare with saved file:\n{result['error']}")
+            else:
+                self.show_diff_window(tab, *result["diff"])
+
+        worker = threading.Thread(target=work, daemon=True)
+        worker.start()
+        self.status_message("Comparing with saved file...")
+        poll()
+
+    def show_diff_window(self, tab, hunks, old_lines, new_lines):
+        win = tk.Toplevel(self.root)
+        win.title(f"Changes in {tab.title}")
+        win.geometry("800x600")
+        view = tk.Text(win, wrap=tk.NONE, borderwidth=0, highlightthickness=0, font=tab.text.cget("font"))
+        scroll = ttk.Scrollbar(win, orient="vertical", command=view.yview)
+        view.configure(yscrollcommand=scroll.set)
+        scroll.pack(side="right", fill="y")
+        view.pack(fill="both", expand=True)
+        view.tag_configure("hunk", foreground="#61afef")
+        view.tag_configure("added", background="#203a20")
+        view.tag_configure("removed", background="#3a2020")
+
+        # Unified diff; jump[row] is the buffer line a row maps to (double-click jumps there)
+        rows, tags, jump = [], [], []
+        for hunk in hunks:
+            i1, i2, j1, j2 = hunk[0][1], hunk[-1][2], hunk[0][3], hunk[-1][4]
+            rows.append(f"@@ -{i1 + 1},{i2 - i1} +{j1 + 1},{j2 - j1} @@")
+            tags.append("hunk")
+            jump.append(j1 + 1)
+            for tag, a1, a2, b1, b2 in hunk:
+                if tag == "equal":
+                    rows.extend(" " + line for line in new_lines[b1:b2])
+                    tags.extend([None] * (b2 - b1))
+                    jump.extend(range(b1 + 1, b2 + 1))
+                    continue
+                rows.extend("-" + line for line in old_lines[a1:a2])
+                tags.extend(["removed"] * (a2 - a1))
+                jump.extend([b1 + 1] * (a2 - a1))
+                rows.extend("+" + line for line in new_lines[b1:b2])
+                tags.extend(["added"] * (b2 - b1))
+                jump.extend(range(b1 + 1, b2 + 1))
+        view.insert("1.0", "\n".join(rows) if rows else "No differences.")
+        for row, tag in enumerate(tags, start=1):
+            if tag:
+                view.tag_add(tag, f"{row}.0", f"{row}.end+1c")
+        view.configure(state="disabled")
+
+        def on_jump(event):
+            row = int(view.index(f"@{event.x},{event.y}").split(".")[0])
+            if row <= len(jump):
+                tab.text.mark_set(tk.INSERT, f"{jump[row - 1]}.0")
+                tab.text.see(tk.INSERT)
+                tab.text.focus_set()
+        view.bind("<Double-Button-1>", on_jump)
+
     def toggle_word_wrap(self):
         tab = self.current_tab()
         if not tab:
@@ -768,9 +3316,11 @@ class NotepadApp:
 
         self.root.configure(bg=bg)
         for tab in getattr(self, "_tabs", []):
-            tab.text.configure(background=bg, foreground=fg, insertbackground=fg)
-            tab.line_numbers.configure(background=ln_bg, foreground=ln_fg)
-            tab.status.configure(background=ln_bg, foreground=ln_fg)
+            for view in tab.views:
+                view.text.configure(background=bg, foreground=fg, insertbackground=fg)
+                view.line_numbers.configure(background=ln_bg, foreground=ln_fg)
+            for _, label in tab.status_bars():
+                label.configure(background=ln_bg, foreground=ln_fg)
             # Update tags in dark mode (colors set already fit)
             tab.update_line_numbers()
 
@@ -785,8 +3335,9 @@ class NotepadApp:
         else:
             size = max(8, min(36, size + delta))
         new_font = (family, size)
-        tab.text.configure(font=new_font)
-        tab.line_numbers.configure(font=new_font)
+        for view in tab.views:
+            view.text.configure(font=new_font)
+            view.line_numbers.configure(font=new_font)
 
     def toggle_autosave_current(self):
         tab = self.current_tab()
@@ -804,8 +3355,9 @@ class NotepadApp:
             start = f"{i}.0"
             end = f"{i}.end"
             line = tab.text.get(start, end)
-            tab.text.delete(start, end)
-            tab.text.insert(start, line.rstrip())
+            stripped = line.rstrip()
+            if len(stripped) != len(line):
+                tab.text.delete(f"{i}.{len(stripped)}", end)
         tab.highlight_trailing_whitespace()
         self.status_message("Trimmed trailing whitespace.")
 
@@ -813,18 +3365,14 @@ class NotepadApp:
         tab = self.current_tab()
         if not tab:
             return
-        content = tab.text.get("1.0", tk.END).replace("\t", "    ")
-        tab.text.delete("1.0", tk.END)
-        tab.text.insert("1.0", content)
+        tab.replace_content(tab.get_content().replace("\t", "    "))
         self.status_message("Converted tabs to spaces.")
 
     def spaces_to_tabs(self):
         tab = self.current_tab()
         if not tab:
             return
-        content = re.sub(r" {4}", "\t", tab.text.get("1.0", tk.END))
-        tab.text.delete("1.0", tk.END)
-        tab.text.insert("1.0", content)
+        tab.replace_content(re.sub(r" {4}", "\t", tab.get_content()))
         self.status_message("Converted spaces to tabs.")
 
     def update_title(self):
@@ -844,8 +3392,6 @@ class NotepadApp:
 def main():
     root = tk.Tk()
     app = NotepadApp(root)
-    # Registry for tabs since early methods referenced it
-    app._tabs = []
     # Hook tab registration to new_tab
     original_new_tab = app.new_tab
     def new_tab_hook(*args, **kwargs):